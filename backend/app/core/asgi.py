@@ -0,0 +1,52 @@
+from typing import Any, Callable, Dict, Optional
+from starlette.datastructures import Headers
+
+def set_content_length(start_message: Dict[str, Any], length: int) -> None:
+    """Patch Content-Length in the app's own raw header list rather than
+    rebuilding the headers through a new Response"""
+    headers = list(start_message.get('headers', []))
+    content_length = (b'content-length', str(length).encode('latin-1'))
+    for i, (name, _) in enumerate(headers):
+        if name == b'content-length':
+            headers[i] = content_length
+            break
+    else:
+        headers.append(content_length)
+    start_message['headers'] = headers
+
+async def rewrite_json_response(
+    app,
+    scope,
+    receive,
+    send,
+    rewrite: Callable[[bytes], Optional[bytes]]
+) -> None:
+    """Run the app, passing a JSON response body through rewrite.
+
+    Only application/json responses are buffered; the start message is held
+    back until the whole body has been seen. rewrite returns the new body,
+    or None to send the original unchanged. Other responses stream through.
+    """
+    start_message = None
+    body_parts = []
+
+    async def send_wrapper(message):
+        nonlocal start_message
+        if message['type'] == 'http.response.start':
+            if Headers(raw=message.get('headers', [])).get('content-type') == 'application/json':
+                start_message = message
+                return
+        elif start_message is not None and message['type'] == 'http.response.body':
+            body_parts.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                body = b''.join(body_parts)
+                new_body = rewrite(body)
+                if new_body is not None:
+                    body = new_body
+                    set_content_length(start_message, len(body))
+                await send(start_message)
+                await send({'type': 'http.response.body', 'body': body})
+            return
+        await send(message)
+
+    await app(scope, receive, send_wrapper)
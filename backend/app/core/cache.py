@@ -50,6 +50,15 @@ class CacheManager:
                 logger.error(f"Redis disconnect error: {str(e)}")
                 raise
 
+    async def ping(self) -> bool:
+        """Check the Redis connection with a single PING"""
+        try:
+            await self.connect()
+            return bool(await self._redis.ping())
+        except Exception as e:
+            logger.error(f"Cache ping error: {str(e)}")
+            return False
+
     def _get_key(self, key: str) -> str:
         """Get prefixed cache key"""
         return f"{self.prefix}{key}"
@@ -1,10 +1,10 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Sequence
 from dataclasses import dataclass, field
 from fastapi import Request, Response, HTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
 from app.core.logging import logger
 
-@dataclass
+@dataclass(slots=True)
 class ErrorDetail:
     """Detailed error information"""
     code: str
@@ -12,6 +12,9 @@ class ErrorDetail:
     field: Optional[str] = None
     params: Dict[str, Any] = field(default_factory=dict)
 
+# Shared by every error raised without details; immutable so safe to share
+_EMPTY_DETAILS: tuple = ()
+
 class AppError(Exception):
     """Base application error"""
     def __init__(
@@ -25,7 +28,7 @@ class AppError(Exception):
         self.message = message
         self.code = code
         self.status_code = status_code
-        self.details = details or []
+        self.details: Sequence[ErrorDetail] = details if details else _EMPTY_DETAILS
 
 class ValidationError(AppError):
     """Validation error"""
@@ -97,6 +100,23 @@ class ConflictError(AppError):
             details=details
         )
 
+class RateLimitExceededError(AppError):
+    """Rate limit exceeded error"""
+    def __init__(
+        self,
+        message: str = "Rate limit exceeded",
+        retry_after: int = 1,
+        details: Optional[List[ErrorDetail]] = None
+    ):
+        super().__init__(
+            message=message,
+            code="RATE_LIMIT_EXCEEDED",
+            status_code=429,
+            details=details
+        )
+        # Seconds until a retry can be admitted, for the Retry-After header
+        self.retry_after = retry_after
+
 class ErrorHandler:
     """Handles error formatting and response generation"""
     
@@ -136,7 +156,8 @@ class ErrorMiddleware(BaseHTTPMiddleware):
             
         except HTTPException as e:
             logger.warning(
-                f"HTTP error: {e.detail}",
+                "HTTP error: %s",
+                e.detail,
                 extra={"status_code": e.status_code}
             )
             error = AppError(
@@ -152,7 +173,8 @@ class ErrorMiddleware(BaseHTTPMiddleware):
             
         except AppError as e:
             logger.error(
-                f"Application error: {e.message}",
+                "Application error: %s",
+                e.message,
                 extra={
                     "code": e.code,
                     "status_code": e.status_code,
@@ -166,7 +188,7 @@ class ErrorMiddleware(BaseHTTPMiddleware):
             )
             
         except Exception as e:
-            logger.error(f"Unhandled error: {str(e)}", exc_info=True)
+            logger.error("Unhandled error: %s", e, exc_info=True)
             error = AppError(message="Internal server error")
             return Response(
                 content=ErrorHandler.format_error(error),
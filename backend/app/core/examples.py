@@ -1,4 +1,4 @@
-from typing import Dict, Optional, Any, List, Union
+from typing import Dict, Optional, Any, List, Tuple, Union
 from dataclasses import dataclass, field
 from fastapi import FastAPI
 from app.core.logging import logger
@@ -17,7 +17,7 @@ class APIExample:
 
 class ExampleManager:
     def __init__(self):
-        self._examples: Dict[str, Dict[str, APIExample]] = {}
+        self._examples: Dict[Tuple[str, str], Dict[str, APIExample]] = {}
 
     def add_example(
         self,
@@ -25,20 +25,19 @@ class ExampleManager:
         method: str,
         example: APIExample
     ) -> None:
-        key = f"{method.upper()} {path}"
+        key = (method.upper(), path)
         if key not in self._examples:
             self._examples[key] = {}
         
         self._examples[key][example.name] = example
-        logger.info(f"Added example '{example.name}' for {key}")
+        logger.info("Added example '%s' for %s %s", example.name, key[0], path)
 
     def get_examples(
         self,
         path: str,
         method: str
     ) -> Dict[str, APIExample]:
-        key = f"{method.upper()} {path}"
-        return self._examples.get(key, {})
+        return self._examples.get((method.upper(), path), {})
 
     def get_example(
         self,
@@ -49,37 +48,41 @@ class ExampleManager:
         examples = self.get_examples(path, method)
         return examples.get(name)
 
+    def _one(self, example: APIExample) -> Dict[str, Any]:
+        example_doc = {
+            'summary': example.summary
+        }
+
+        if example.description:
+            example_doc['description'] = example.description
+
+        if example.value:
+            example_doc['value'] = example.value
+        elif example.external_value:
+            example_doc['externalValue'] = example.external_value
+
+        return example_doc
+
     def to_openapi(
         self,
         path: str,
         method: str
     ) -> Dict[str, Dict[str, Any]]:
         examples = self.get_examples(path, method)
-        if not examples:
-            return {}
-
-        openapi_examples = {}
-        for name, example in examples.items():
-            example_doc = {
-                'summary': example.summary
-            }
+        return {name: self._one(example) for name, example in examples.items()}
 
-            if example.description:
-                example_doc['description'] = example.description
-
-            if example.value:
-                example_doc['value'] = example.value
-            elif example.external_value:
-                example_doc['externalValue'] = example.external_value
-
-            openapi_examples[name] = example_doc
-
-        return openapi_examples
+    def build_all_openapi(self) -> Dict[Tuple[str, str], Dict[str, Dict[str, Any]]]:
+        """Build the OpenAPI examples for every registered route at once"""
+        return {
+            key: {name: self._one(example) for name, example in examples.items()}
+            for key, examples in self._examples.items()
+        }
 
 class ExampleDocumentation:
     def __init__(self, app: FastAPI):
         self.app = app
         self.example_manager = ExampleManager()
+        self._openapi_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
 
     def setup(self) -> None:
         """Setup API examples"""
@@ -127,6 +130,8 @@ class ExampleDocumentation:
             )
         )
 
+        self._openapi_cache = self.example_manager.build_all_openapi()
+
         # Update OpenAPI schema to include examples
         def custom_openapi():
             if not self.app.openapi_schema:
@@ -135,7 +140,7 @@ class ExampleDocumentation:
                 # Add examples to paths
                 for path, path_item in self.app.openapi_schema['paths'].items():
                     for method, operation in path_item.items():
-                        examples = self.example_manager.to_openapi(path, method)
+                        examples = self._openapi_cache.get((method.upper(), path), {})
                         if examples:
                             if 'requestBody' in operation:
                                 operation['requestBody']['content']['application/json']['examples'] = examples
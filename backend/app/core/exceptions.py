@@ -19,7 +19,8 @@ class AppException(HTTPException):
         )
         self.headers = headers
         logger.error(
-            f"Application exception: {message}",
+            "Application exception: %s",
+            message,
             extra={'details': details}
         )
 
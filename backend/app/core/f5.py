@@ -1,8 +1,9 @@
-from typing import Optional, Dict, Any
-import requests
-from requests.exceptions import RequestException
+from typing import Optional, Dict, Any, TYPE_CHECKING
 from app.core.errors import AppError
 
+if TYPE_CHECKING:
+    import requests
+
 class F5Error(AppError):
     pass
 
@@ -11,10 +12,14 @@ class F5Client:
         self.host = host
         self.username = username
         self.password = password
-        self.session: Optional[requests.Session] = None
+        self.session: Optional["requests.Session"] = None
         self._token: Optional[str] = None
 
     def connect(self) -> None:
+        # Imported here so importing app.core does not pull in requests
+        import requests
+        from requests.exceptions import RequestException
+
         try:
             self.session = requests.Session()
             # Add connection logic
@@ -24,6 +29,8 @@ class F5Client:
     def execute_command(self, command: str) -> Dict[str, Any]:
         if not self.session or not self._token:
             raise F5Error("Not connected to F5 device")
+        from requests.exceptions import RequestException
+
         try:
             # Add command execution logic
             pass
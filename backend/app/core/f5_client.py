@@ -1,60 +1,99 @@
-from typing import Dict, Any, Optional
-import requests
-from requests.adapters import HTTPAdapter, Retry
-from urllib3.util.retry import Retry
+from typing import Dict, Any, Optional, TYPE_CHECKING
+import asyncio
 from app.core.errors import F5Error
 from app.core.logging import logger
+from app.core.retry import RetryStrategy
+
+if TYPE_CHECKING:
+    import aiohttp
 
 class F5Client:
+    # Shared by every client so connections to a device are kept alive and
+    # reused across F5Client instances; created lazily inside the event loop
+    _session: Optional["aiohttp.ClientSession"] = None
+
     def __init__(
-        self, 
-        host: str, 
-        username: str, 
+        self,
+        host: str,
+        username: str,
         password: str,
         verify_ssl: bool = True,
         timeout: int = 30
     ):
+        # Imported here so importing app.core does not pull in aiohttp
+        import aiohttp
+
         self.host = host
         self.username = username
         self.password = password
         self.verify_ssl = verify_ssl
-        self.timeout = timeout
-        self.session = self._create_session()
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        # As with urllib3's Retry(total=3) on a POST: up to 3 retries, only
+        # when the connection could not be made, never on a 5xx response
+        self.retry_strategy = RetryStrategy(
+            max_retries=3,
+            initial_delay=1.0,
+            retry_on_exceptions=(aiohttp.ClientConnectorError,)
+        )
         self.token: Optional[str] = None
+        self._auth_header: Dict[str, str] = {}
 
-    def _create_session(self) -> requests.Session:
-        session = requests.Session()
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[500, 502, 503, 504]
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("https://", adapter)
-        session.mount("http://", adapter)
-        return session
+    @classmethod
+    def _get_session(cls) -> "aiohttp.ClientSession":
+        import aiohttp
+
+        if cls._session is None or cls._session.closed:
+            cls._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=32),
+                headers={"Accept-Encoding": "gzip"}
+            )
+        return cls._session
+
+    @classmethod
+    async def close(cls) -> None:
+        """Close the shared session, e.g. on application shutdown"""
+        if cls._session is not None and not cls._session.closed:
+            await cls._session.close()
+        cls._session = None
+
+    async def _post(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        session = self._get_session()
+        retries = 0
+        while True:
+            try:
+                async with session.post(
+                    url,
+                    json=payload,
+                    headers=self._auth_header,
+                    ssl=None if self.verify_ssl else False,
+                    timeout=self.timeout
+                ) as response:
+                    response.raise_for_status()
+                    return await response.json()
+            except self.retry_strategy.retry_on_exceptions:
+                if retries >= self.retry_strategy.max_retries:
+                    raise
+                retries += 1
+                await asyncio.sleep(self.retry_strategy.get_delay(retries))
 
-    def authenticate(self) -> None:
+    async def authenticate(self) -> None:
         try:
-            response = self.session.post(
+            data = await self._post(
                 f"https://{self.host}/mgmt/shared/authn/login",
-                json={
+                {
                     "username": self.username,
                     "password": self.password,
                     "loginProviderName": "tmos"
-                },
-                verify=self.verify_ssl,
-                timeout=self.timeout
+                }
             )
-            response.raise_for_status()
-            self.token = response.json()["token"]["token"]
-            self.session.headers.update({
+            self.token = data["token"]["token"]
+            self._auth_header = {
                 "X-F5-Auth-Token": self.token
-            })
+            }
         except Exception as e:
-            logger.error(f"F5 authentication failed: {str(e)}")
+            logger.error("F5 authentication failed: %s", e)
             raise F5Error(f"Authentication failed: {str(e)}")
 
-    def _ensure_authenticated(self) -> None:
+    async def _ensure_authenticated(self) -> None:
         if not self.token:
-            self.authenticate() 
\ No newline at end of file
+            await self.authenticate()
\ No newline at end of file
@@ -1,9 +1,10 @@
 from pathlib import Path
 from typing import Optional, List
+import os
 import shutil
+import asyncio
 import hashlib
 from datetime import datetime
-import aiofiles
 from app.core.logging import logger
 from app.core.errors import FileError
 
@@ -13,6 +14,8 @@ class FileHandler:
         self.base_dir.mkdir(parents=True, exist_ok=True)
 
     async def save_file(self, file_path: Path, content: bytes, make_backup: bool = True) -> None:
+        import aiofiles
+
         file_path = self.base_dir / file_path
         file_path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -23,18 +26,34 @@ class FileHandler:
             async with aiofiles.open(file_path, 'wb') as f:
                 await f.write(content)
         except Exception as e:
-            logger.error(f"Error saving file {file_path}: {e}")
+            logger.error("Error saving file %s: %s", file_path, e)
             raise FileError(f"Failed to save file: {e}")
 
     async def _create_backup(self, file_path: Path) -> None:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_path = file_path.with_suffix(f'.{timestamp}.bak')
         try:
-            shutil.copy2(file_path, backup_path)
+            await asyncio.to_thread(self._copy_file, file_path, backup_path)
         except Exception as e:
-            logger.error(f"Error creating backup of {file_path}: {e}")
+            logger.error("Error creating backup of %s: %s", file_path, e)
             raise FileError(f"Failed to create backup: {e}")
 
+    @staticmethod
+    def _copy_file(src_path: Path, dst_path: Path) -> None:
+        """Copy file contents in-kernel where possible, then copy metadata"""
+        with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+            if hasattr(os, 'sendfile'):
+                size = os.fstat(src.fileno()).st_size
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(dst.fileno(), src.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            else:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        shutil.copystat(src_path, dst_path)
+
     def get_file_hash(self, file_path: Path) -> str:
         file_path = self.base_dir / file_path
         if not file_path.exists():
@@ -47,5 +66,5 @@ class FileHandler:
                     hash_md5.update(chunk)
             return hash_md5.hexdigest()
         except Exception as e:
-            logger.error(f"Error calculating hash for {file_path}: {e}")
+            logger.error("Error calculating hash for %s: %s", file_path, e)
             raise FileError(f"Failed to calculate file hash: {e}") 
\ No newline at end of file
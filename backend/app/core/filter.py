@@ -1,6 +1,8 @@
-from typing import Any, Dict, List, Optional, Union, Callable
+from typing import Any, Dict, List, Optional, Tuple, Union, Callable
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.routing import compile_path
+from urllib.parse import urlencode
 import re
 from app.core.logging import logger
 
@@ -31,17 +33,44 @@ class RequestFilter:
             return filter_func(data, context) if context else filter_func(data)
         except Exception as e:
             logger.error(
-                f"Error applying filter {filter_name}: {str(e)}",
+                "Error applying filter %s: %s",
+                filter_name,
+                e,
                 extra={'context': context}
             )
             raise
 
+    def compile_map(
+        self,
+        filter_map: Dict[str, str]
+    ) -> Tuple[Tuple[str, Callable], ...]:
+        """Resolve a field -> filter name mapping into (field, callable) pairs"""
+        compiled = []
+        for key, filter_name in filter_map.items():
+            if filter_name not in self.filters:
+                raise ValueError(f"Filter not found: {filter_name}")
+            compiled.append((key, self.filters[filter_name]))
+        return tuple(compiled)
+
     def filter_dict(
         self,
         data: Dict[str, Any],
-        filter_map: Dict[str, str]
+        filter_map: Union[Dict[str, str], Tuple[Tuple[str, Callable], ...]]
     ) -> Dict[str, Any]:
         """Apply filters to dictionary fields based on a mapping"""
+        if isinstance(filter_map, tuple):
+            filtered = dict(data)
+            for key, filter_func in filter_map:
+                if key in filtered:
+                    try:
+                        keep = filter_func(filtered[key])
+                    except Exception as e:
+                        logger.error("Error applying filter to %s: %s", key, e)
+                        raise
+                    if not keep:
+                        del filtered[key]
+            return filtered
+
         filtered = {}
         for key, value in data.items():
             if key in filter_map:
@@ -61,10 +90,29 @@ class RequestFilterMiddleware(BaseHTTPMiddleware):
         super().__init__(app)
         self.request_filter = request_filter
         self.route_filters = route_filters
+        self._compiled = {
+            path: request_filter.compile_map(filter_map)
+            for path, filter_map in route_filters.items()
+        }
+        # Templated routes such as /api/users/{id} are matched by regex,
+        # compiled once here rather than per request
+        self._templated = tuple(
+            (compile_path(path)[0], filters)
+            for path, filters in self._compiled.items()
+            if '{' in path
+        )
+
+    def _match_filters(self, path: str) -> Optional[Tuple[Tuple[str, Callable], ...]]:
+        filters = self._compiled.get(path)
+        if filters is None:
+            for path_regex, templated_filters in self._templated:
+                if path_regex.match(path):
+                    return templated_filters
+        return filters
 
     async def dispatch(self, request: Request, call_next) -> Response:
         path = request.url.path
-        filters = self.route_filters.get(path)
+        filters = self._match_filters(path)
 
         if not filters:
             return await call_next(request)
@@ -85,17 +133,20 @@ class RequestFilterMiddleware(BaseHTTPMiddleware):
                     filters
                 )
                 # Update query parameters
-                request.scope["query_string"] = (
-                    "&".join(f"{k}={v}" for k, v in filtered_params.items())
-                ).encode()
+                request.scope["query_string"] = urlencode(
+                    filtered_params,
+                    doseq=True
+                ).encode("ascii")
 
         except Exception as e:
-            logger.error(f"Error filtering request: {str(e)}")
+            logger.error("Error filtering request: %s", e)
             # Continue with original request if filtering fails
             pass
 
         return await call_next(request)
 
+_NUMERIC_RE = re.compile(r'-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?')
+
 # Example filters
 def not_empty(value: Any) -> bool:
     if isinstance(value, str):
@@ -106,7 +157,7 @@ def is_numeric(value: Any) -> bool:
     if isinstance(value, (int, float)):
         return True
     if isinstance(value, str):
-        return value.replace('.', '').isdigit()
+        return _NUMERIC_RE.fullmatch(value) is not None
     return False
 
 def is_email(value: str) -> bool:
@@ -1,9 +1,15 @@
-from typing import Dict, Optional, Any, List, Union, Callable
+import json
+import functools
+import orjson
+from typing import Dict, Optional, Any, List, Tuple, Union, Callable
 from dataclasses import dataclass, field
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from app.core.logging import logger
 
+# Scalar types whose filter results can be memoized
+_CACHEABLE_TYPES = frozenset({str, int, float, bool})
+
 @dataclass
 class FilterRule:
     field: str
@@ -13,12 +19,17 @@ class FilterRule:
 
 class RequestFilter:
     def __init__(self):
-        self._rules: Dict[str, List[FilterRule]] = {}
+        self._rules: Dict[Tuple[str, str], List[FilterRule]] = {}
         self._default_filters = {
             'remove_empty': lambda x: x if x else None,
             'remove_whitespace': lambda x: x.strip() if isinstance(x, str) else x,
             'remove_special_chars': lambda x: ''.join(c for c in str(x) if c.isalnum()) if x else x
         }
+        # Memoized variants of pure filters, keyed by the original function
+        self._cached_filters: Dict[Callable, Callable] = {
+            func: functools.lru_cache(maxsize=1024, typed=True)(func)
+            for func in self._default_filters.values()
+        }
 
     def add_rule(
         self,
@@ -26,7 +37,7 @@ class RequestFilter:
         method: str,
         rule: FilterRule
     ) -> None:
-        key = f"{method.upper()} {path}"
+        key = (method.upper(), path)
         if key not in self._rules:
             self._rules[key] = []
         self._rules[key].append(rule)
@@ -34,9 +45,16 @@ class RequestFilter:
     def add_default_filter(
         self,
         name: str,
-        filter_func: Callable
+        filter_func: Callable,
+        pure: bool = False
     ) -> None:
+        """Register a filter; pure filters have their scalar results memoized"""
         self._default_filters[name] = filter_func
+        if pure:
+            self._cached_filters[filter_func] = functools.lru_cache(
+                maxsize=1024,
+                typed=True
+            )(filter_func)
 
     def filter_value(
         self,
@@ -44,13 +62,27 @@ class RequestFilter:
         filter_func: Callable
     ) -> Any:
         try:
-            if isinstance(value, list):
-                return [v for v in (self.filter_value(v, filter_func) for v in value) if v is not None]
-            elif isinstance(value, dict):
-                return {k: v for k, v in ((k, self.filter_value(v, filter_func)) for k, v in value.items()) if v is not None}
+            value_type = type(value)
+            if value_type is list or (value_type is not dict and isinstance(value, list)):
+                filtered = []
+                append = filtered.append
+                for v in value:
+                    fv = self.filter_value(v, filter_func)
+                    if fv is not None:
+                        append(fv)
+                return filtered
+            elif value_type is dict or isinstance(value, dict):
+                return {
+                    k: fv for k, v in value.items()
+                    if (fv := self.filter_value(v, filter_func)) is not None
+                }
+            if value_type in _CACHEABLE_TYPES:
+                cached_func = self._cached_filters.get(filter_func)
+                if cached_func is not None:
+                    return cached_func(value)
             return filter_func(value)
         except Exception as e:
-            logger.error(f"Filtering error: {str(e)}")
+            logger.error("Filtering error: %s", e)
             return value
 
     def filter_data(
@@ -62,23 +94,29 @@ class RequestFilter:
         if not data:
             return None
 
-        key = f"{request.method.upper()} {request.url.path}"
+        # Starlette already upper-cases the request method
+        key = (request.method, request.url.path)
         if key not in self._rules:
             return data
 
-        filtered = data.copy()
-        for rule in self._rules[key]:
-            if rule.apply_to_response != is_response:
-                continue
+        applicable = [
+            rule for rule in self._rules[key]
+            if rule.apply_to_response == is_response and rule.field in data
+        ]
+        if not applicable:
+            return data
 
-            if rule.field in filtered:
-                filtered[rule.field] = self.filter_value(
-                    filtered[rule.field],
-                    rule.filter_func
-                )
+        filtered = dict(data)
+        for rule in applicable:
+            filtered[rule.field] = self.filter_value(
+                filtered[rule.field],
+                rule.filter_func
+            )
 
         # Remove None values
-        filtered = {k: v for k, v in filtered.items() if v is not None}
+        none_keys = [k for k, v in filtered.items() if v is None]
+        for k in none_keys:
+            del filtered[k]
         return filtered
 
 class FilterMiddleware(BaseHTTPMiddleware):
@@ -90,13 +128,13 @@ class FilterMiddleware(BaseHTTPMiddleware):
     ):
         super().__init__(app)
         self.filter = filter_ or RequestFilter()
-        self.exclude_paths = exclude_paths or {
+        self.exclude_paths = frozenset(exclude_paths or {
             '/health',
             '/metrics',
             '/docs',
             '/redoc',
             '/openapi.json'
-        }
+        })
 
     async def dispatch(self, request: Request, call_next) -> Response:
         if request.url.path in self.exclude_paths:
@@ -107,7 +145,6 @@ class FilterMiddleware(BaseHTTPMiddleware):
             if request.method in ['POST', 'PUT', 'PATCH']:
                 body_bytes = await request.body()
                 if body_bytes:
-                    import json
                     try:
                         body = json.loads(body_bytes)
                         filtered_body = self.filter.filter_data(
@@ -117,9 +154,7 @@ class FilterMiddleware(BaseHTTPMiddleware):
                         )
                         
                         if filtered_body:
-                            async def get_body():
-                                return json.dumps(filtered_body).encode()
-                            request._body = get_body
+                            request._body = orjson.dumps(filtered_body)
                     except json.JSONDecodeError:
                         pass
 
@@ -149,7 +184,7 @@ class FilterMiddleware(BaseHTTPMiddleware):
             return response
             
         except Exception as e:
-            logger.error(f"Error in request/response filtering: {str(e)}")
+            logger.error("Error in request/response filtering: %s", e)
             return await call_next(request)
 
 # Example usage:
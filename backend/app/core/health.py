@@ -2,7 +2,7 @@ from typing import Dict, Any, List, Optional, Callable
 import time
 import psutil
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from sqlalchemy.exc import SQLAlchemyError
 from app.db.session import SessionLocal
 from app.core.logging import logger
@@ -14,7 +14,7 @@ from threading import Lock
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 import asyncio
-import json
+import orjson
 
 class HealthStatus(Enum):
     HEALTHY = "healthy"
@@ -35,20 +35,69 @@ class HealthManager:
     def __init__(
         self,
         db_manager: Optional[DatabaseManager] = None,
-        cache_manager: Optional[CacheManager] = None
+        cache_manager: Optional[CacheManager] = None,
+        max_concurrency: int = 10,
+        component_timeout: float = 5.0,
+        cache_ttl: float = 5.0
     ):
         self._checks: Dict[str, HealthCheck] = {}
         self._status: Dict[str, bool] = {}
         self._last_check: Dict[str, float] = {}
         self.start_time = datetime.utcnow()
+        self._start_monotonic = time.monotonic()
         self.db_manager = db_manager
         self.cache_manager = cache_manager
+        self.component_timeout = component_timeout
+        # Bounds how many checks hit shared resources at the same time
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Last full result, served to callers until it is cache_ttl old
+        self.cache_ttl = cache_ttl
+        self._cached_result: Optional[Dict[str, Any]] = None
+        self._cached_at = 0.0
+        self._cache_lock = asyncio.Lock()
+        # Overall status kept current by the background loop, so request
+        # handling can read it without running any checks
+        self._healthy = True
+        self._background_task: Optional[asyncio.Task] = None
+        # Prime the non-blocking CPU sampler; its first reading is always 0.0
+        psutil.cpu_percent(interval=None)
+        # Neither changes for the life of the process
+        self._process = psutil.Process(os.getpid())
+        self._cpu_count = psutil.cpu_count()
 
     def add_check(self, check: HealthCheck) -> None:
         """Add a health check to the manager"""
         self._checks[check.name] = check
         self._status[check.name] = False
-        self._last_check[check.name] = 0
+        self._last_check[check.name] = float('-inf')
+
+    def start(self) -> None:
+        """Start the background health loop; must be called inside the event loop"""
+        if self._background_task is None or self._background_task.done():
+            self._background_task = asyncio.create_task(self._background_loop())
+
+    async def stop(self) -> None:
+        """Stop the background health loop"""
+        if self._background_task is not None:
+            self._background_task.cancel()
+            try:
+                await self._background_task
+            except asyncio.CancelledError:
+                pass
+            self._background_task = None
+
+    async def _background_loop(self) -> None:
+        """Periodically refresh the overall health status"""
+        while True:
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.error(f"Background health check failed: {str(e)}")
+            interval = min(
+                (check.interval for check in self._checks.values()),
+                default=60.0
+            )
+            await asyncio.sleep(interval)
 
     async def run_check(self, name: str) -> bool:
         """Run a specific health check"""
@@ -78,20 +127,86 @@ class HealthManager:
             self._status[name] = False
             return False
 
+    async def _run_bounded(self, coro, timeout: float) -> Any:
+        """Run a check under the concurrency limit with an overall timeout"""
+        async with self._semaphore:
+            return await asyncio.wait_for(coro, timeout=timeout)
+
+    @staticmethod
+    def _check_budget(check: HealthCheck) -> float:
+        """Total time a check may take including its retries"""
+        return check.timeout * check.retries + 0.5 * (check.retries - 1)
+
+    async def _run_check_if_due(self, name: str) -> bool:
+        """Run a check unless it ran within its interval"""
+        check = self._checks[name]
+        if time.monotonic() - self._last_check[name] < check.interval:
+            return self._status[name]
+        status = await self.run_check(name)
+        self._last_check[name] = time.monotonic()
+        return status
+
+    def _cache_is_fresh(self) -> bool:
+        return (
+            self._cached_result is not None
+            and time.monotonic() - self._cached_at < self.cache_ttl
+        )
+
     async def check_health(self) -> Dict[str, Any]:
-        """Run all health checks and return results"""
+        """Return health results, reusing the last run within cache_ttl"""
+        if self._cache_is_fresh():
+            return self._cached_result
+
+        # Concurrent callers wait for a single run instead of each starting one
+        async with self._cache_lock:
+            if self._cache_is_fresh():
+                return self._cached_result
+            results = await self._run_all_checks()
+            self._cached_result = results
+            self._cached_at = time.monotonic()
+            self._healthy = results['status'] == 'healthy'
+            return results
+
+    async def _run_all_checks(self) -> Dict[str, Any]:
+        """Run all health checks concurrently and return results"""
+        names = list(self._checks)
+        tasks = [
+            self._run_bounded(
+                self._run_check_if_due(name),
+                self._check_budget(self._checks[name])
+            )
+            for name in names
+        ]
+
+        components = ['system']
+        tasks.append(self._run_bounded(self._check_system(), self.component_timeout))
+        if self.db_manager:
+            components.append('database')
+            tasks.append(self._run_bounded(self._check_database(), self.component_timeout))
+        if self.cache_manager:
+            components.append('cache')
+            tasks.append(self._run_bounded(self._check_cache(), self.component_timeout))
+
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+
         results = {
-            'timestamp': datetime.utcnow().isoformat(),
+            'timestamp': datetime.now(timezone.utc),
             'uptime': self._get_uptime(),
-            'system': await self._check_system(),
             'checks': {}
         }
         
         overall_status = True
 
-        # Run component checks
-        for name, check in self._checks.items():
-            status = await self.run_check(name)
+        # Component checks
+        for name, status in zip(names, outcomes[:len(names)]):
+            check = self._checks[name]
+            if isinstance(status, BaseException):
+                logger.warning(
+                    f"Health check did not complete: {name}",
+                    extra={'error': str(status)}
+                )
+                self._status[name] = False
+                status = False
             results['checks'][name] = {
                 'status': 'healthy' if status else 'unhealthy',
                 'required': check.required
@@ -99,15 +214,12 @@ class HealthManager:
             if check.required and not status:
                 overall_status = False
 
-        # Add database and cache status if available
-        if self.db_manager:
-            results['database'] = await self._check_database()
-            if results['database']['status'] == 'unhealthy':
-                overall_status = False
-
-        if self.cache_manager:
-            results['cache'] = await self._check_cache()
-            if results['cache']['status'] == 'unhealthy':
+        # System, database and cache status
+        for component, result in zip(components, outcomes[len(names):]):
+            if isinstance(result, BaseException):
+                result = {'status': 'unhealthy', 'error': str(result) or type(result).__name__}
+            results[component] = result
+            if component != 'system' and result['status'] == 'unhealthy':
                 overall_status = False
 
         results['status'] = 'healthy' if overall_status else 'unhealthy'
@@ -115,28 +227,29 @@ class HealthManager:
 
     def _get_uptime(self) -> float:
         """Get service uptime in seconds"""
-        return (datetime.utcnow() - self.start_time).total_seconds()
+        return time.monotonic() - self._start_monotonic
 
     async def _check_system(self) -> Dict[str, Any]:
         """Check system resources"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            process = psutil.Process(os.getpid())
+            # CPU usage since the previous call, without sleeping
+            cpu_percent = psutil.cpu_percent(interval=None)
+            memory, disk, process_memory = await asyncio.to_thread(
+                self._sample_system
+            )
             
             return {
                 'status': 'healthy',
                 'cpu': {
                     'percent': cpu_percent,
-                    'cores': psutil.cpu_count()
+                    'cores': self._cpu_count
                 },
                 'memory': {
                     'total': memory.total,
                     'available': memory.available,
                     'percent': memory.percent,
-                    'process_rss': process.memory_info().rss / 1024 / 1024,  # MB
-                    'process_vms': process.memory_info().vms / 1024 / 1024   # MB
+                    'process_rss': process_memory.rss / 1024 / 1024,  # MB
+                    'process_vms': process_memory.vms / 1024 / 1024   # MB
                 },
                 'disk': {
                     'total': disk.total,
@@ -148,6 +261,14 @@ class HealthManager:
             logger.error(f"System health check failed: {str(e)}")
             return {'status': 'unhealthy', 'error': str(e)}
 
+    def _sample_system(self):
+        """Read memory, disk and process stats; runs in a worker thread"""
+        return (
+            psutil.virtual_memory(),
+            psutil.disk_usage('/'),
+            self._process.memory_info()
+        )
+
     async def _check_database(self) -> Dict[str, Any]:
         """Check database connection"""
         try:
@@ -160,9 +281,20 @@ class HealthManager:
             logger.error(f"Database health check failed: {str(e)}")
             return {'status': 'unhealthy', 'error': str(e)}
 
-    async def _check_cache(self) -> Dict[str, Any]:
-        """Check cache connection"""
+    async def _check_cache(self, deep: bool = False) -> Dict[str, Any]:
+        """Check cache connection
+
+        The default probe is a single PING; pass deep=True (e.g. from a
+        scheduled job) to run the full set/get/delete round trip.
+        """
         try:
+            if not deep:
+                working = await self.cache_manager.ping()
+                return {
+                    'status': 'healthy' if working else 'unhealthy',
+                    'working': working
+                }
+
             test_key = '_health_check_test'
             test_value = datetime.utcnow().isoformat()
             
@@ -189,37 +321,47 @@ class HealthMiddleware(BaseHTTPMiddleware):
         super().__init__(app)
         self.health_manager = health_manager or HealthManager()
         self.health_path = health_path
-        self.exclude_paths = exclude_paths or {
+        self.exclude_paths = frozenset(exclude_paths or (
             '/metrics',
             '/docs',
             '/redoc',
             '/openapi.json'
+        ))
+        # Paths answered directly by the middleware, dispatched by one lookup
+        self.fast_paths = {
+            health_path: self._health_response
         }
 
+    async def _health_response(self) -> Response:
+        results = await self.health_manager.check_health()
+        status_code = 200 if results['status'] == 'healthy' else 503
+        return Response(
+            content=orjson.dumps(results, option=orjson.OPT_UTC_Z),
+            status_code=status_code,
+            media_type='application/json'
+        )
+
     async def dispatch(self, request: Request, call_next) -> Response:
         try:
+            self.health_manager.start()
+            path = request.scope['path']
+
             # Handle health check requests
-            if request.url.path == self.health_path:
-                results = await self.health_manager.check_health()
-                status_code = 200 if results['status'] == 'healthy' else 503
-                return Response(
-                    content=json.dumps(results),
-                    status_code=status_code,
-                    media_type='application/json'
-                )
+            handler = self.fast_paths.get(path)
+            if handler is not None:
+                return await handler()
 
             # Skip health checks for excluded paths
-            if request.url.path in self.exclude_paths:
+            if path in self.exclude_paths:
                 return await call_next(request)
 
-            # Check health before processing request
-            health_status = await self.health_manager.check_health()
-            if health_status['status'] != 'healthy':
+            # Reject requests while the background checks report unhealthy
+            if not self.health_manager._healthy:
                 return Response(
-                    content=json.dumps({
+                    content=orjson.dumps({
                         'error': 'Service unhealthy',
-                        'details': health_status
-                    }),
+                        'details': self.health_manager._cached_result
+                    }, option=orjson.OPT_UTC_Z),
                     status_code=503,
                     media_type='application/json'
                 )
@@ -1,14 +1,26 @@
+import atexit
+import glob
 import logging
-import json
+import os
+import queue
 import sys
-import traceback
-from datetime import datetime
+import time
+import orjson
+from contextvars import ContextVar
 from typing import Dict, Any, Optional
 from pathlib import Path
-from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    TimedRotatingFileHandler
+)
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from app.core.config import settings
+from app.core.timestamps import format_timestamp
+
+# Set by the request middleware for the duration of each request
+request_id_ctx: ContextVar[str] = ContextVar('request_id', default='no_request')
 
 class JSONFormatter(logging.Formatter):
     """Custom JSON formatter for logs"""
@@ -20,13 +32,14 @@ class JSONFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as JSON"""
         log_data = {
-            'timestamp': datetime.utcnow().isoformat(),
+            'timestamp': format_timestamp(record.created),
             'level': record.levelname,
             'message': record.getMessage(),
             'logger': record.name,
             'module': record.module,
             'function': record.funcName,
-            'line': record.lineno
+            'line': record.lineno,
+            'request_id': getattr(record, 'request_id', None) or request_id_ctx.get()
         }
 
         # Add default fields
@@ -36,29 +49,105 @@ class JSONFormatter(logging.Formatter):
         if hasattr(record, 'extra'):
             log_data.update(record.extra)
 
-        # Add exception info if present
+        # Add exception info if present; the rendered traceback is cached on
+        # the record so each handler formatting it reuses the same text
         if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
             log_data['exception'] = {
                 'type': record.exc_info[0].__name__,
                 'message': str(record.exc_info[1]),
-                'traceback': traceback.format_exception(*record.exc_info)
+                'traceback': record.exc_text
             }
 
-        return json.dumps(log_data)
+        return orjson.dumps(
+            log_data,
+            default=str,
+            option=orjson.OPT_UTC_Z
+        ).decode()
 
-class RequestIdFilter(logging.Filter):
-    """Filter that adds request ID to log records"""
-    
-    def filter(self, record: logging.LogRecord) -> bool:
-        if not hasattr(record, 'request_id'):
-            record.request_id = 'no_request'
-        return True
+class LocalQueueHandler(QueueHandler):
+    """QueueHandler for an in-process queue.
+
+    Records are passed through unchanged so formatting (including
+    exc_info) happens in the listener thread, not in the caller. The
+    request id is captured here since the listener thread does not share
+    the caller's context.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if 'request_id' not in record.__dict__:
+            record.request_id = request_id_ctx.get()
+        return record
+
+class SizedTimedRotatingFileHandler(TimedRotatingFileHandler):
+    """Rotates at the configured time and also when the file reaches max_bytes.
+
+    Size-triggered rollovers are numbered within the current period
+    (app.log.2024-01-01.001, .002, ...) so they never overwrite each other.
+    """
+
+    def __init__(self, filename: str, max_bytes: int = 0, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.max_bytes = max_bytes
+        self._size_rollover = False
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if super().shouldRollover(record):
+            self._size_rollover = False
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            # Checked against what has already been written, so the record
+            # isn't formatted twice; the file may exceed max_bytes by one
+            # record. The stream is opened for append, so tell() is the size
+            if self.stream.tell() >= self.max_bytes:
+                self._size_rollover = True
+                return True
+        return False
+
+    def doRollover(self) -> None:
+        if not self._size_rollover:
+            super().doRollover()
+            return
+
+        self._size_rollover = False
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        now = time.gmtime() if self.utc else time.localtime()
+        prefix = f"{self.baseFilename}.{time.strftime(self.suffix, now)}"
+        numbers = [
+            int(suffix)
+            for suffix in (
+                name.rsplit('.', 1)[1]
+                for name in glob.glob(glob.escape(prefix) + '.*')
+            )
+            if suffix.isdigit()
+        ]
+        index = max(numbers, default=0) + 1
+        self.rotate(self.baseFilename, f"{prefix}.{index:03d}")
+        if self.backupCount > 0:
+            for old_file in self.getFilesToDelete():
+                os.remove(old_file)
+        if not self.delay:
+            self.stream = self._open()
+
+_queue_listener: Optional[QueueListener] = None
+
+def stop_logging() -> None:
+    """Flush queued records and stop the background log listener"""
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
 
 def setup_logging(
     log_level: str = "INFO",
     log_file: Optional[str] = None,
     max_size: int = 10 * 1024 * 1024,  # 10MB
-    backup_count: int = 5,
+    backup_count: int = 30,
     json_format: bool = True
 ) -> logging.Logger:
     """Setup application logging"""
@@ -66,10 +155,13 @@ def setup_logging(
     # Create logger
     logger = logging.getLogger('app')
     logger.setLevel(log_level)
-    logger.addFilter(RequestIdFilter())
+    # Handlers are attached here; don't emit every record again via root
+    logger.propagate = False
 
     # Clear any existing handlers
+    stop_logging()
     logger.handlers.clear()
+    handlers = []
 
     # Create formatters
     if json_format:
@@ -87,31 +179,35 @@ def setup_logging(
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers.append(console_handler)
 
     # File handler if log file specified
     if log_file:
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Use RotatingFileHandler for size-based rotation
-        file_handler = RotatingFileHandler(
+        # Single file rotated daily and whenever it exceeds max_size
+        file_handler = SizedTimedRotatingFileHandler(
             log_file,
-            maxBytes=max_size,
+            max_bytes=max_size,
+            when='midnight',
+            interval=1,
             backupCount=backup_count
         )
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
 
-        # Add daily rotation handler
-        daily_handler = TimedRotatingFileHandler(
-            log_file + '.daily',
-            when='midnight',
-            interval=1,
-            backupCount=30
-        )
-        daily_handler.setFormatter(formatter)
-        logger.addHandler(daily_handler)
+    # Callers only enqueue records; formatting and I/O run on the
+    # listener's background thread
+    global _queue_listener
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(LocalQueueHandler(log_queue))
+    _queue_listener = QueueListener(
+        log_queue,
+        *handlers,
+        respect_handler_level=True
+    )
+    _queue_listener.start()
 
     return logger
 
@@ -127,64 +223,74 @@ class LoggingMiddleware(BaseHTTPMiddleware):
     ):
         super().__init__(app)
         self.logger = logger or logging.getLogger('app')
-        self.exclude_paths = exclude_paths or {
+        self.exclude_paths = frozenset(exclude_paths or (
             '/health',
             '/metrics',
             '/docs',
             '/redoc',
             '/openapi.json'
-        }
+        ))
         self.log_request_body = log_request_body
 
     async def dispatch(self, request: Request, call_next) -> Response:
-        if request.url.path in self.exclude_paths:
+        path = request.scope['path']
+        if path in self.exclude_paths:
             return await call_next(request)
 
-        start_time = datetime.utcnow()
+        start_time = time.perf_counter()
         request_id = request.headers.get('X-Request-ID', 'unknown')
+        request_id_token = request_id_ctx.set(request_id)
+        # Evaluated once; skips building log payloads when INFO is muted
+        log_info = self.logger.isEnabledFor(logging.INFO)
         
         # Log request
-        log_data = {
-            'request_id': request_id,
-            'method': request.method,
-            'path': request.url.path,
-            'query_params': dict(request.query_params),
-            'client_ip': request.client.host,
-            'user_agent': request.headers.get('user-agent'),
-        }
+        if log_info:
+            log_data = {
+                'request_id': request_id,
+                'method': request.method,
+                'path': path,
+                'query_params': dict(request.query_params),
+                'client_ip': request.client.host if request.client else None,
+                'user_agent': request.headers.get('user-agent'),
+            }
 
-        if self.log_request_body and request.method in ('POST', 'PUT', 'PATCH'):
-            try:
-                body = await request.json()
-                log_data['body'] = body
-            except:
-                pass
+            if self.log_request_body and request.method in ('POST', 'PUT', 'PATCH'):
+                try:
+                    body = await request.json()
+                    log_data['body'] = body
+                except:
+                    pass
 
-        self.logger.info(
-            f"Request {request.method} {request.url.path}",
-            extra=log_data
-        )
+            self.logger.info(
+                "Request %s %s",
+                request.method,
+                path,
+                extra=log_data
+            )
 
         try:
             response = await call_next(request)
             
             # Log response
-            duration = (datetime.utcnow() - start_time).total_seconds()
-            self.logger.info(
-                f"Response {response.status_code}",
-                extra={
-                    'request_id': request_id,
-                    'status_code': response.status_code,
-                    'duration': duration
-                }
-            )
+            if log_info:
+                duration = time.perf_counter() - start_time
+                self.logger.info(
+                    "Response %s",
+                    response.status_code,
+                    extra={
+                        'request_id': request_id,
+                        'status_code': response.status_code,
+                        'duration': duration
+                    }
+                )
             
             return response
             
         except Exception as e:
-            duration = (datetime.utcnow() - start_time).total_seconds()
+            duration = time.perf_counter() - start_time
             self.logger.error(
-                f"Request failed: {str(e)}",
+                "Request failed: %s",
+                e,
                 extra={
                     'request_id': request_id,
                     'error': str(e),
@@ -193,10 +299,13 @@ class LoggingMiddleware(BaseHTTPMiddleware):
                 exc_info=True
             )
             raise
+        finally:
+            request_id_ctx.reset(request_id_token)
 
 # Initialize logger
 logger = setup_logging(
     log_level=settings.LOG_LEVEL,
     log_file=settings.LOG_FILE,
     json_format=settings.LOG_JSON_FORMAT
-) 
\ No newline at end of file
+)
+atexit.register(stop_logging) 
\ No newline at end of file
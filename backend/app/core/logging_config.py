@@ -1,14 +1,14 @@
 import logging
-import json
-from datetime import datetime
+import orjson
 from pathlib import Path
 from typing import Any, Dict
 from app.core.config import settings
+from app.core.timestamps import format_timestamp
 
 class JSONFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
         log_data: Dict[str, Any] = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": format_timestamp(record.created),
             "level": record.levelname,
             "message": record.getMessage(),
             "module": record.module,
@@ -22,7 +22,11 @@ class JSONFormatter(logging.Formatter):
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
             
-        return json.dumps(log_data)
+        return orjson.dumps(
+            log_data,
+            default=str,
+            option=orjson.OPT_UTC_Z
+        ).decode()
 
 def setup_logging() -> None:
     log_dir = Path("logs")
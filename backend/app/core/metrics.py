@@ -1,4 +1,4 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
 import time
@@ -22,73 +22,82 @@ class MetricDefinition:
     buckets: Optional[List[float]] = None  # For histograms
     quantiles: Optional[List[float]] = None  # For summaries
 
+_DEFAULT_METRICS: Optional[Dict[str, Any]] = None
+
 class MetricsManager:
     def __init__(self):
         self._metrics: Dict[str, Any] = {}
-        self._start_time = time.time()
+        self._start_time = time.monotonic()
+        # Scrapes closer together than this reuse the previous system sample
+        self._sys_metrics_min_interval = 2.0
+        self._sys_metrics_last = 0.0
+        # Prime the non-blocking CPU sampler so the first scrape is not 0.0
+        psutil.cpu_percent(interval=None)
+        # Labeled children per (method, path, status), so .labels() only
+        # runs the first time a combination is seen
+        self._label_cache: Dict[Tuple[str, str, int], Tuple[Any, ...]] = {}
         
         # Initialize default metrics
         self._setup_default_metrics()
 
     def _setup_default_metrics(self) -> None:
         """Setup default application metrics"""
-        self.add_metric(MetricDefinition(
-            name='app_uptime_seconds',
-            description='Application uptime in seconds',
-            metric_type='gauge'
-        ))
-
-        self.add_metric(MetricDefinition(
-            name='app_requests_total',
-            description='Total number of HTTP requests',
-            metric_type='counter',
-            labels=['method', 'path', 'status']
-        ))
-
-        self.add_metric(MetricDefinition(
-            name='app_request_duration_seconds',
-            description='HTTP request duration in seconds',
-            metric_type='histogram',
-            labels=['method', 'path'],
-            buckets=[0.01, 0.05, 0.1, 0.5, 1.0, 5.0]
-        ))
-
-        self.add_metric(MetricDefinition(
-            name='app_request_size_bytes',
-            description='HTTP request size in bytes',
-            metric_type='summary',
-            labels=['method', 'path'],
-            quantiles=[0.5, 0.9, 0.99]
-        ))
-
-        self.add_metric(MetricDefinition(
-            name='app_response_size_bytes',
-            description='HTTP response size in bytes',
-            metric_type='summary',
-            labels=['method', 'path'],
-            quantiles=[0.5, 0.9, 0.99]
-        ))
-
-        # System metrics
-        self.add_metric(MetricDefinition(
-            name='system_cpu_usage_percent',
-            description='System CPU usage percentage',
-            metric_type='gauge'
-        ))
-
-        self.add_metric(MetricDefinition(
-            name='system_memory_usage_bytes',
-            description='System memory usage in bytes',
-            metric_type='gauge',
-            labels=['type']
-        ))
+        global _DEFAULT_METRICS
+        # prometheus_client's registry is global, so the default metrics are
+        # created once per process and shared by every manager
+        if _DEFAULT_METRICS is None:
+            _DEFAULT_METRICS = {
+                'app_uptime_seconds': Gauge(
+                    'app_uptime_seconds',
+                    'Application uptime in seconds'
+                ),
+                'app_requests_total': Counter(
+                    'app_requests_total',
+                    'Total number of HTTP requests',
+                    ['method', 'path', 'status']
+                ),
+                'app_request_duration_seconds': Histogram(
+                    'app_request_duration_seconds',
+                    'HTTP request duration in seconds',
+                    ['method', 'path'],
+                    buckets=[0.01, 0.05, 0.1, 0.5, 1.0, 5.0]
+                ),
+                'app_request_size_bytes': Summary(
+                    'app_request_size_bytes',
+                    'HTTP request size in bytes',
+                    ['method', 'path']
+                ),
+                'app_response_size_bytes': Summary(
+                    'app_response_size_bytes',
+                    'HTTP response size in bytes',
+                    ['method', 'path']
+                ),
+                # System metrics
+                'system_cpu_usage_percent': Gauge(
+                    'system_cpu_usage_percent',
+                    'System CPU usage percentage'
+                ),
+                'system_memory_usage_bytes': Gauge(
+                    'system_memory_usage_bytes',
+                    'System memory usage in bytes',
+                    ['type']
+                ),
+                'system_disk_usage_bytes': Gauge(
+                    'system_disk_usage_bytes',
+                    'System disk usage in bytes',
+                    ['type']
+                )
+            }
 
-        self.add_metric(MetricDefinition(
-            name='system_disk_usage_bytes',
-            description='System disk usage in bytes',
-            metric_type='gauge',
-            labels=['type']
-        ))
+        self._metrics.update(_DEFAULT_METRICS)
+        self.uptime: Gauge = _DEFAULT_METRICS['app_uptime_seconds']
+        self.requests_total: Counter = _DEFAULT_METRICS['app_requests_total']
+        self.request_duration: Histogram = _DEFAULT_METRICS['app_request_duration_seconds']
+        self.request_size: Summary = _DEFAULT_METRICS['app_request_size_bytes']
+        self.response_size: Summary = _DEFAULT_METRICS['app_response_size_bytes']
+        self.cpu_usage: Gauge = _DEFAULT_METRICS['system_cpu_usage_percent']
+        self.memory_usage: Gauge = _DEFAULT_METRICS['system_memory_usage_bytes']
+        self.disk_usage: Gauge = _DEFAULT_METRICS['system_disk_usage_bytes']
 
     def add_metric(self, definition: MetricDefinition) -> None:
         """Add a new metric based on its definition"""
@@ -135,34 +144,54 @@ class MetricsManager:
         """Get a metric by name"""
         return self._metrics.get(name)
 
+    def request_metrics(self, method: str, path: str, status: int) -> Tuple[Any, ...]:
+        """Get the (counter, duration, request size, response size) children"""
+        key = (method, path, status)
+        children = self._label_cache.get(key)
+        if children is None:
+            children = (
+                self.requests_total.labels(method=method, path=path, status=status),
+                self.request_duration.labels(method=method, path=path),
+                self.request_size.labels(method=method, path=path),
+                self.response_size.labels(method=method, path=path)
+            )
+            self._label_cache[key] = children
+        return children
+
+    @staticmethod
+    def _sample_system():
+        """Read CPU, memory and disk stats; runs in a worker thread"""
+        return (
+            psutil.cpu_percent(interval=None),
+            psutil.virtual_memory(),
+            psutil.disk_usage('/')
+        )
+
     async def update_system_metrics(self) -> None:
         """Update system-related metrics"""
+        now = time.monotonic()
+        if now - self._sys_metrics_last < self._sys_metrics_min_interval:
+            return
+        self._sys_metrics_last = now
+
         try:
+            cpu, memory, disk = await asyncio.to_thread(self._sample_system)
+
             # CPU usage
-            cpu_metric = self.get_metric('system_cpu_usage_percent')
-            if cpu_metric:
-                cpu_metric.set(psutil.cpu_percent())
+            self.cpu_usage.set(cpu)
 
             # Memory usage
-            memory = psutil.virtual_memory()
-            memory_metric = self.get_metric('system_memory_usage_bytes')
-            if memory_metric:
-                memory_metric.labels(type='total').set(memory.total)
-                memory_metric.labels(type='available').set(memory.available)
-                memory_metric.labels(type='used').set(memory.used)
+            self.memory_usage.labels(type='total').set(memory.total)
+            self.memory_usage.labels(type='available').set(memory.available)
+            self.memory_usage.labels(type='used').set(memory.used)
 
             # Disk usage
-            disk = psutil.disk_usage('/')
-            disk_metric = self.get_metric('system_disk_usage_bytes')
-            if disk_metric:
-                disk_metric.labels(type='total').set(disk.total)
-                disk_metric.labels(type='free').set(disk.free)
-                disk_metric.labels(type='used').set(disk.used)
+            self.disk_usage.labels(type='total').set(disk.total)
+            self.disk_usage.labels(type='free').set(disk.free)
+            self.disk_usage.labels(type='used').set(disk.used)
 
             # Update uptime
-            uptime_metric = self.get_metric('app_uptime_seconds')
-            if uptime_metric:
-                uptime_metric.set(time.time() - self._start_time)
+            self.uptime.set(time.monotonic() - self._start_time)
 
         except Exception as e:
             logger.error(f"Error updating system metrics: {str(e)}")
@@ -180,17 +209,20 @@ class MetricsMiddleware(BaseHTTPMiddleware):
         self.metrics_manager = metrics_manager or MetricsManager()
         self.metrics_path = metrics_path
         self.update_system_metrics = update_system_metrics
-        self.exclude_paths = exclude_paths or {
+        self.exclude_paths = frozenset(exclude_paths or (
             '/health',
             '/metrics',
             '/docs',
             '/redoc',
             '/openapi.json'
-        }
+        ))
 
     async def dispatch(self, request: Request, call_next) -> Response:
+        # Raw ASGI path; avoids building a URL object
+        request_path = request.scope['path']
+
         # Handle metrics endpoint
-        if request.url.path == self.metrics_path:
+        if request_path == self.metrics_path:
             if self.update_system_metrics:
                 await self.metrics_manager.update_system_metrics()
             return Response(
@@ -199,20 +231,18 @@ class MetricsMiddleware(BaseHTTPMiddleware):
             )
 
         # Skip metrics for excluded paths
-        if request.url.path in self.exclude_paths:
+        if request_path in self.exclude_paths:
             return await call_next(request)
 
         try:
             # Record request metrics
             start_time = time.time()
             method = request.method
-            path = request.url.path
 
-            # Track request size
-            request_size = len(await request.body())
-            request_size_metric = self.metrics_manager.get_metric('app_request_size_bytes')
-            if request_size_metric:
-                request_size_metric.labels(method=method, path=path).observe(request_size)
+            # Track request size from the header rather than reading the body,
+            # which would consume the receive stream; chunked requests are skipped
+            request_length = request.headers.get('content-length')
+            request_size = int(request_length) if request_length and request_length.isdigit() else None
 
             # Get response
             response = await call_next(request)
@@ -220,26 +250,32 @@ class MetricsMiddleware(BaseHTTPMiddleware):
             # Record response metrics
             duration = time.time() - start_time
             status = response.status_code
+            # Label by route template (e.g. /users/{id}) so the number of
+            # series stays bounded by the declared routes
+            route = request.scope.get('route')
+            path = getattr(route, 'path', None) or 'unknown'
+            counter, duration_metric, request_size_metric, response_size_metric = (
+                self.metrics_manager.request_metrics(method, path, status)
+            )
+
+            if request_size is not None:
+                request_size_metric.observe(request_size)
 
             # Update request counter
-            requests_total = self.metrics_manager.get_metric('app_requests_total')
-            if requests_total:
-                requests_total.labels(
-                    method=method,
-                    path=path,
-                    status=status
-                ).inc()
+            counter.inc()
 
             # Update duration histogram
-            duration_metric = self.metrics_manager.get_metric('app_request_duration_seconds')
-            if duration_metric:
-                duration_metric.labels(method=method, path=path).observe(duration)
-
-            # Track response size
-            response_size = len(response.body)
-            response_size_metric = self.metrics_manager.get_metric('app_response_size_bytes')
-            if response_size_metric:
-                response_size_metric.labels(method=method, path=path).observe(response_size)
+            duration_metric.observe(duration)
+
+            # Track response size; streamed responses without a length are skipped
+            content_length = response.headers.get('content-length')
+            if content_length is not None:
+                response_size = int(content_length) if content_length.isdigit() else None
+            else:
+                body = getattr(response, 'body', None)
+                response_size = len(body) if body is not None else None
+            if response_size is not None:
+                response_size_metric.observe(response_size)
 
             return response
 
@@ -1,106 +1,298 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import hashlib
+import heapq
+import math
+import sys
 import time
+from time import perf_counter_ns
 from datetime import datetime
 from threading import Lock
-from collections import defaultdict
+from collections import deque
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
-from app.core.logging import logger
 
-class APIMetricsCollector:
+# Duration samples kept per endpoint
+MAX_DURATION_SAMPLES = 1000
+
+# Report keys for every valid HTTP status, built once at import
+STATUS_KEYS: Dict[int, str] = {
+    code: sys.intern(f'status_{code}') for code in range(100, 600)
+}
+
+class _HyperLogLog:
+    """Approximate distinct counter in a fixed 2**PRECISION bytes
+
+    Standard error is about 1.04 / sqrt(2**PRECISION), ~3% at the default.
+    """
+    __slots__ = ('registers',)
+
+    PRECISION = 10
+    _M = 1 << PRECISION
+    _ALPHA = 0.7213 / (1 + 1.079 / _M)
+    _VALUE_BITS = 64 - PRECISION
+    _VALUE_MASK = (1 << _VALUE_BITS) - 1
+    # 0x80 in every register byte, for the bytewise max in merge()
+    _HIGH_BITS = int.from_bytes(b'\x80' * _M, 'big')
+
+    def __init__(self):
+        self.registers = bytearray(self._M)
+
+    def add(self, value: str) -> None:
+        hashed = int.from_bytes(
+            hashlib.blake2b(value.encode(), digest_size=8).digest(),
+            'big'
+        )
+        index = hashed >> self._VALUE_BITS
+        # Position of the leftmost 1 bit in the remaining bits
+        rank = self._VALUE_BITS - (hashed & self._VALUE_MASK).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: '_HyperLogLog') -> None:
+        # Registers hold ranks below 0x80, so the bytewise max can be taken
+        # across all of them at once as big integers: (a | 0x80) - b keeps
+        # each byte's high bit exactly where a >= b, which becomes the mask
+        high = self._HIGH_BITS
+        a = int.from_bytes(self.registers, 'big')
+        b = int.from_bytes(other.registers, 'big')
+        mask = ((((a | high) - b) & high) >> 7) * 0xFF
+        self.registers = bytearray(((a & mask) | (b & ~mask)).to_bytes(self._M, 'big'))
+
+    def estimate(self) -> int:
+        m = self._M
+        registers = self.registers
+        raw = self._ALPHA * m * m / sum(2.0 ** -r for r in registers)
+        zeros = registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Small range correction (linear counting)
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+class _EndpointMetrics:
+    """Counters for one endpoint in one time bucket, guarded by its stripe lock"""
+    __slots__ = ('total_requests', 'durations', 'unique_clients')
+
     def __init__(self):
-        self._metrics: Dict[str, Dict[str, Any]] = defaultdict(lambda: defaultdict(int))
-        self._timings: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(list))
+        self.total_requests = 0
+        # Ring buffer: the oldest sample is dropped on append once full
+        self.durations: deque = deque(maxlen=MAX_DURATION_SAMPLES)
+        # Fixed-size sketch: memory doesn't grow with the number of clients
+        self.unique_clients = _HyperLogLog()
+
+    def merge(self, other: '_EndpointMetrics') -> None:
+        self.total_requests += other.total_requests
+        self.durations.extend(other.durations)
+        self.unique_clients.merge(other.unique_clients)
+
+class APIMetricsCollector:
+    # Number of lock stripes; must be a power of two
+    STRIPES = 16
+
+    def __init__(
+        self,
+        bucket_seconds: int = 60,
+        bucket_count: int = 60
+    ):
+        # Each method/route pair gets a small integer id on first sight; ids
+        # key the per-bucket counters and index the interned report names.
+        # Paths are route templates, so this is bounded by declared routes
+        self._endpoint_ids: Dict[Tuple[str, str], int] = {}
+        self._endpoint_names: List[str] = []
+        # Requests are recorded into time buckets held in a ring, so the
+        # reported window (bucket_seconds * bucket_count, an hour by default)
+        # rolls forward one bucket at a time instead of being wiped at once.
+        # Each slot holds (bucket number, endpoint id -> counters,
+        # (endpoint id, status code) -> count).
+        self._bucket_seconds = bucket_seconds
+        self._bucket_count = bucket_count
+        self._buckets: List[Optional[Tuple[int, Dict[int, _EndpointMetrics], Dict[Tuple[int, int], int]]]] = (
+            [None] * bucket_count
+        )
+        # Updates to an endpoint only take the lock for its stripe; the
+        # collector lock is held just to rotate buckets or add endpoints
+        self._stripes = [Lock() for _ in range(self.STRIPES)]
         self._lock = Lock()
-        self._last_cleanup = time.time()
-        self._cleanup_interval = 3600  # 1 hour
+        # (current bucket number, merged counters, merged statuses) of the
+        # closed buckets in the window; rebuilt once per bucket rotation so
+        # a scrape only merges the current bucket into it
+        self._closed: Optional[Tuple[int, Dict[int, _EndpointMetrics], Dict[int, Dict[str, int]]]] = None
+
+    def _stripe(self, endpoint_id: int) -> Lock:
+        return self._stripes[endpoint_id & (self.STRIPES - 1)]
+
+    def _endpoint_id(self, key: Tuple[str, str]) -> int:
+        endpoint_id = self._endpoint_ids.get(key)
+        if endpoint_id is None:
+            with self._lock:
+                endpoint_id = self._endpoint_ids.get(key)
+                if endpoint_id is None:
+                    # "METHOD:path" report key, formatted once per endpoint
+                    self._endpoint_names.append(sys.intern(f"{key[0]}:{key[1]}"))
+                    endpoint_id = self._endpoint_ids[key] = len(self._endpoint_names) - 1
+        return endpoint_id
+
+    def _current_bucket(self) -> Tuple[int, Dict[int, _EndpointMetrics], Dict[Tuple[int, int], int]]:
+        number = int(time.monotonic() // self._bucket_seconds)
+        slot = number % self._bucket_count
+        bucket = self._buckets[slot]
+        if bucket is None or bucket[0] != number:
+            with self._lock:
+                bucket = self._buckets[slot]
+                if bucket is None or bucket[0] != number:
+                    # Replaces the expired bucket that used this slot
+                    bucket = self._buckets[slot] = (number, {}, {})
+        return bucket
 
     def record_request(
         self,
         method: str,
         path: str,
         status_code: int,
-        duration: float,
+        duration_ns: int,
         client_ip: str
     ) -> None:
-        with self._lock:
-            key = f"{method}:{path}"
-            
+        endpoint_id = self._endpoint_id((method, path))
+        _, endpoints, status_counts = self._current_bucket()
+        endpoint = endpoints.get(endpoint_id)
+        if endpoint is None:
+            with self._lock:
+                endpoint = endpoints.get(endpoint_id)
+                if endpoint is None:
+                    endpoint = endpoints[endpoint_id] = _EndpointMetrics()
+
+        status_key = (endpoint_id, status_code)
+        with self._stripe(endpoint_id):
             # Update request counts
-            self._metrics[key]['total_requests'] += 1
-            self._metrics[key][f'status_{status_code}'] += 1
+            endpoint.total_requests += 1
+            status_counts[status_key] = status_counts.get(status_key, 0) + 1
             
             # Update timing statistics
-            self._timings[key]['durations'].append(duration)
-            if len(self._timings[key]['durations']) > 1000:
-                self._timings[key]['durations'] = self._timings[key]['durations'][-1000:]
+            endpoint.durations.append(duration_ns)
             
             # Record unique clients
-            if 'unique_clients' not in self._metrics[key]:
-                self._metrics[key]['unique_clients'] = set()
-            self._metrics[key]['unique_clients'].add(client_ip)
+            endpoint.unique_clients.add(client_ip)
+
+    def _merge_buckets(
+        self,
+        buckets: List[Tuple[int, Dict[int, _EndpointMetrics], Dict[Tuple[int, int], int]]],
+        merged: Dict[int, _EndpointMetrics],
+        merged_statuses: Dict[int, Dict[str, int]]
+    ) -> None:
+        for _, endpoints, status_counts in buckets:
+            with self._lock:
+                endpoints = list(endpoints.items())
+                status_counts = list(status_counts.items())
+            for endpoint_id, endpoint in endpoints:
+                total = merged.get(endpoint_id)
+                if total is None:
+                    total = merged[endpoint_id] = _EndpointMetrics()
+                with self._stripe(endpoint_id):
+                    total.merge(endpoint)
+            for (endpoint_id, code), count in status_counts:
+                statuses = merged_statuses.setdefault(endpoint_id, {})
+                status_key = STATUS_KEYS.get(code) or f'status_{code}'
+                statuses[status_key] = statuses.get(status_key, 0) + count
 
     def get_metrics(self) -> Dict[str, Any]:
+        current = int(time.monotonic() // self._bucket_seconds)
+        oldest = current - self._bucket_count + 1
         with self._lock:
-            self._cleanup_old_metrics()
-            
-            metrics = {}
-            for key, data in self._metrics.items():
-                metrics[key] = {
-                    'total_requests': data['total_requests'],
-                    'status_codes': {
-                        k: v for k, v in data.items()
-                        if k.startswith('status_')
-                    },
-                    'unique_clients': len(data['unique_clients']),
-                    'timing_stats': self._calculate_timing_stats(key)
-                }
-            return metrics
-
-    def _calculate_timing_stats(self, key: str) -> Dict[str, float]:
-        durations = self._timings[key]['durations']
+            # Live buckets, oldest first, so merged durations keep the
+            # most recent samples
+            buckets = sorted(
+                (bucket for bucket in self._buckets
+                 if bucket is not None and bucket[0] >= oldest),
+                key=lambda bucket: bucket[0]
+            )
+
+        closed = self._closed
+        if closed is None or closed[0] != current:
+            closed_merged: Dict[int, _EndpointMetrics] = {}
+            closed_statuses: Dict[int, Dict[str, int]] = {}
+            self._merge_buckets(
+                [bucket for bucket in buckets if bucket[0] < current],
+                closed_merged,
+                closed_statuses
+            )
+            closed = self._closed = (current, closed_merged, closed_statuses)
+
+        # Start from copies of the closed totals, then add the current bucket
+        merged: Dict[int, _EndpointMetrics] = {}
+        for endpoint_id, endpoint in closed[1].items():
+            total = merged[endpoint_id] = _EndpointMetrics()
+            total.merge(endpoint)
+        merged_statuses = {
+            endpoint_id: dict(statuses)
+            for endpoint_id, statuses in closed[2].items()
+        }
+        self._merge_buckets(
+            [bucket for bucket in buckets if bucket[0] == current],
+            merged,
+            merged_statuses
+        )
+
+        metrics = {}
+        for endpoint_id, endpoint in merged.items():
+            metrics[self._endpoint_names[endpoint_id]] = {
+                'total_requests': endpoint.total_requests,
+                'status_codes': merged_statuses.get(endpoint_id, {}),
+                'unique_clients': endpoint.unique_clients.estimate(),
+                'timing_stats': self._calculate_timing_stats(endpoint)
+            }
+        return metrics
+
+    def _calculate_timing_stats(self, endpoint: _EndpointMetrics) -> Dict[str, float]:
+        # One copy of the ring so every statistic sees the same samples;
+        # samples are integer nanoseconds, reported in seconds
+        durations = tuple(endpoint.durations)
         if not durations:
             return {}
 
+        count = len(durations)
+        # The p95 sample is the (count - index)-th largest, so only the top
+        # 5% needs ordering rather than the whole window
+        p95_rank = count - int(count * 0.95)
         return {
-            'min': min(durations),
-            'max': max(durations),
-            'avg': sum(durations) / len(durations),
-            'p95': sorted(durations)[int(len(durations) * 0.95)]
+            'min': min(durations) / 1e9,
+            'max': max(durations) / 1e9,
+            'avg': sum(durations) / count / 1e9,
+            'p95': heapq.nlargest(p95_rank, durations)[-1] / 1e9
         }
 
-    def _cleanup_old_metrics(self) -> None:
-        now = time.time()
-        if now - self._last_cleanup < self._cleanup_interval:
-            return
-
-        try:
-            # Reset metrics older than cleanup interval
-            self._metrics.clear()
-            self._timings.clear()
-            self._last_cleanup = now
-        except Exception as e:
-            logger.error(f"Error cleaning up metrics: {str(e)}")
-
 class APIMetricsMiddleware(BaseHTTPMiddleware):
     def __init__(
         self,
         app,
-        metrics_collector: APIMetricsCollector
+        metrics_collector: APIMetricsCollector,
+        exclude_paths: Optional[Iterable[str]] = None
     ):
         super().__init__(app)
         self.metrics_collector = metrics_collector
+        self.exclude_paths = frozenset(exclude_paths or (
+            '/health',
+            '/metrics',
+            '/docs',
+            '/redoc',
+            '/openapi.json'
+        ))
 
     async def dispatch(self, request: Request, call_next) -> Response:
-        start_time = time.time()
+        path = request.scope['path']
+        if path in self.exclude_paths:
+            return await call_next(request)
+
+        start_ns = perf_counter_ns()
         response = await call_next(request)
-        duration = time.time() - start_time
+        duration_ns = perf_counter_ns() - start_ns
 
+        # Record by route template (e.g. /users/{id}) rather than the raw
+        # path, so each URL with an id in it does not become a new endpoint
+        route = request.scope.get('route')
         self.metrics_collector.record_request(
             method=request.method,
-            path=request.url.path,
+            path=getattr(route, 'path', None) or 'unknown',
             status_code=response.status_code,
-            duration=duration,
+            duration_ns=duration_ns,
             client_ip=request.client.host
         )
 
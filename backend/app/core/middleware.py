@@ -5,13 +5,13 @@ from app.core.errors import AppError
 from app.schemas.responses import ErrorResponse
 import logging
 import traceback
-from uuid import uuid4
+import secrets
 
 logger = logging.getLogger(__name__)
 
 class ErrorHandlerMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
-        request_id = str(uuid4())
+        request_id = secrets.token_hex(16)
         request.state.request_id = request_id
         
         try:
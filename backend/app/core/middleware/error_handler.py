@@ -1,10 +1,11 @@
 from typing import Dict, Any
+from datetime import datetime
 from fastapi import Request, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
+from app.core.config import settings
 from app.core.errors import AppError, AuthenticationError, ValidationError
 from app.core.logging import logger
-from app.schemas.responses import ErrorResponse
 import traceback
 import sys
 
@@ -44,16 +45,18 @@ class ErrorHandlerMiddleware(BaseHTTPMiddleware):
         message: str,
         request: Request,
         include_details: bool = False
-    ) -> JSONResponse:
-        error_response = ErrorResponse(
-            message=message,
-            request_id=getattr(request.state, 'request_id', None)
-        )
-
+    ) -> ORJSONResponse:
+        # Same shape as ErrorResponse(...).dict(exclude_none=True), built
+        # directly since the fields are fixed
+        content = {
+            'status': 'error',
+            'message': message,
+            'timestamp': datetime.utcnow()
+        }
+        request_id = getattr(request.state, 'request_id', None)
+        if request_id is not None:
+            content['request_id'] = request_id
         if include_details:
-            error_response.details = traceback.format_exc()
+            content['details'] = traceback.format_exc()
 
-        return JSONResponse(
-            status_code=status_code,
-            content=error_response.dict(exclude_none=True)
-        ) 
\ No newline at end of file
+        return ORJSONResponse(status_code=status_code, content=content) 
\ No newline at end of file
@@ -1,52 +1,69 @@
 from typing import List
+from datetime import datetime
 from fastapi import Request, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from app.core.config import settings
 from app.core.logging import logger
-from app.schemas.responses import ErrorResponse
+
+_CSP_HEADER = "; ".join([
+    "default-src 'self'",
+    "img-src 'self' data: https:",
+    "script-src 'self' 'unsafe-inline' 'unsafe-eval'",
+    "style-src 'self' 'unsafe-inline'",
+    "font-src 'self' data:",
+    "connect-src 'self'",
+    "frame-ancestors 'none'"
+])
+
+# Encoded once as ASGI (lowercase name, value) pairs so they can be
+# appended to each response's raw headers as-is
+_SECURITY_HEADERS_BYTES = tuple(
+    (name.lower().encode('latin-1'), value.encode('latin-1'))
+    for name, value in (
+        ('X-Content-Type-Options', 'nosniff'),
+        ('X-Frame-Options', 'DENY'),
+        ('X-XSS-Protection', '1; mode=block'),
+        ('Strict-Transport-Security', 'max-age=31536000; includeSubDomains'),
+        ('Content-Security-Policy', _CSP_HEADER),
+        ('Referrer-Policy', 'strict-origin-when-cross-origin')
+    )
+)
+_SECURITY_HEADER_NAMES = frozenset(name for name, _ in _SECURITY_HEADERS_BYTES)
 
 class SecurityMiddleware(BaseHTTPMiddleware):
     def __init__(self, app, allowed_hosts: List[str] = None):
         super().__init__(app)
-        self.allowed_hosts = allowed_hosts or settings.ALLOWED_HOSTS
-        self.security_headers = {
-            'X-Content-Type-Options': 'nosniff',
-            'X-Frame-Options': 'DENY',
-            'X-XSS-Protection': '1; mode=block',
-            'Strict-Transport-Security': 'max-age=31536000; includeSubDomains',
-            'Content-Security-Policy': self._build_csp_header(),
-            'Referrer-Policy': 'strict-origin-when-cross-origin'
-        }
-
-    def _build_csp_header(self) -> str:
-        return "; ".join([
-            "default-src 'self'",
-            "img-src 'self' data: https:",
-            "script-src 'self' 'unsafe-inline' 'unsafe-eval'",
-            "style-src 'self' 'unsafe-inline'",
-            "font-src 'self' data:",
-            "connect-src 'self'",
-            "frame-ancestors 'none'"
-        ])
+        self.allowed_hosts = frozenset(allowed_hosts or settings.ALLOWED_HOSTS)
+        # A wildcard entry allows every host, so the check is skipped
+        self._check_host = '*' not in self.allowed_hosts
 
     async def dispatch(self, request: Request, call_next):
         # Host validation
-        host = request.headers.get('host', '').split(':')[0]
-        if host not in self.allowed_hosts:
+        host = request.headers.get('host', '').partition(':')[0]
+        if self._check_host and host not in self.allowed_hosts:
             logger.warning(f"Invalid host header: {host}")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=400,
-                content=ErrorResponse(
-                    message="Invalid host header",
-                    detail="This host is not allowed to access the API"
-                ).dict()
+                content={
+                    'status': 'error',
+                    'message': "Invalid host header",
+                    'detail': "This host is not allowed to access the API",
+                    'details': None,
+                    'timestamp': datetime.utcnow(),
+                    'request_id': None
+                }
             )
 
         response = await call_next(request)
 
-        # Add security headers
-        for header_name, header_value in self.security_headers.items():
-            response.headers[header_name] = header_value
+        # Add security headers, replacing any the app already set
+        raw_headers = response.raw_headers
+        if any(name in _SECURITY_HEADER_NAMES for name, _ in raw_headers):
+            raw_headers[:] = [
+                header for header in raw_headers
+                if header[0] not in _SECURITY_HEADER_NAMES
+            ]
+        raw_headers.extend(_SECURITY_HEADERS_BYTES)
 
         return response 
\ No newline at end of file
@@ -1,28 +1,44 @@
-from typing import Callable, Dict, Any
+from typing import Callable, Dict, Any, Optional
+from datetime import datetime
 from fastapi import Request, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from pydantic import ValidationError
 from app.core.logging import logger
-from app.schemas.responses import ErrorResponse
-import uuid
+import secrets
+
+def _error_response(
+    status_code: int,
+    message: str,
+    request_id: str,
+    detail: Optional[str] = None
+) -> ORJSONResponse:
+    """Build the ErrorResponse shape directly and serialize it with orjson"""
+    content = {
+        'status': 'error',
+        'message': message,
+        'details': None,
+        'timestamp': datetime.utcnow(),
+        'request_id': request_id
+    }
+    if detail is not None:
+        content['detail'] = detail
+    return ORJSONResponse(status_code=status_code, content=content)
 
 class ValidationMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        request_id = str(uuid.uuid4())
+        request_id = secrets.token_hex(16)
         request.state.request_id = request_id
 
         # Validate request content type
         if request.method in ["POST", "PUT", "PATCH"]:
             content_type = request.headers.get("content-type", "")
             if not content_type.startswith("application/json"):
-                return JSONResponse(
-                    status_code=415,
-                    content=ErrorResponse(
-                        message="Unsupported Media Type",
-                        detail="Content-Type must be application/json",
-                        request_id=request_id
-                    ).dict()
+                return _error_response(
+                    415,
+                    "Unsupported Media Type",
+                    request_id,
+                    detail="Content-Type must be application/json"
                 )
 
         try:
@@ -33,23 +49,19 @@ class ValidationMiddleware(BaseHTTPMiddleware):
                 f"Request validation failed: {str(e)}",
                 extra={"request_id": request_id}
             )
-            return JSONResponse(
-                status_code=422,
-                content=ErrorResponse(
-                    message="Validation Error",
-                    detail=str(e),
-                    request_id=request_id
-                ).dict()
+            return _error_response(
+                422,
+                "Validation Error",
+                request_id,
+                detail=str(e)
             )
         except Exception as e:
             logger.error(
                 f"Unhandled error in request validation: {str(e)}",
                 extra={"request_id": request_id}
             )
-            return JSONResponse(
-                status_code=500,
-                content=ErrorResponse(
-                    message="Internal Server Error",
-                    request_id=request_id
-                ).dict()
+            return _error_response(
+                500,
+                "Internal Server Error",
+                request_id
             ) 
\ No newline at end of file
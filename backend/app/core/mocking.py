@@ -1,4 +1,5 @@
-from typing import Dict, Optional, Any, List, Callable, Union
+from typing import Dict, Optional, Any, List, Callable, Tuple, Union
+import asyncio
 import json
 import re
 from dataclasses import dataclass, field
@@ -13,6 +14,20 @@ class MockResponse:
     body: Optional[Union[Dict[str, Any], str]] = None
     delay: float = 0.0
 
+    def __post_init__(self):
+        # Mock responses are fixed at registration, so the body and headers
+        # are encoded once here rather than on every mocked request
+        body = self.body
+        if isinstance(body, dict):
+            body = json.dumps(body)
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self._body_bytes: bytes = body or b''
+        self._raw_headers = [
+            (key.lower().encode('latin-1'), value.encode('latin-1'))
+            for key, value in self.headers.items()
+        ]
+
 class MockDefinition:
     def __init__(
         self,
@@ -21,7 +36,8 @@ class MockDefinition:
         response: MockResponse,
         match_query_params: bool = False,
         match_headers: bool = False,
-        match_body: bool = False
+        match_body: bool = False,
+        expected_body: Optional[Any] = None
     ):
         self.method = method.upper()
         self.path_pattern = re.compile(path)
@@ -29,6 +45,7 @@ class MockDefinition:
         self.match_query_params = match_query_params
         self.match_headers = match_headers
         self.match_body = match_body
+        self.expected_body = expected_body
         self.call_count = 0
 
     def matches(
@@ -36,8 +53,14 @@ class MockDefinition:
         request: Request,
         query_params: Dict[str, str],
         headers: Dict[str, str],
-        body: Optional[Dict[str, Any]] = None
+        request_body: Optional[Any] = None
     ) -> bool:
+        """Check the request against this mock.
+
+        request_body is the already parsed JSON request body, so it is read
+        once per request rather than once per candidate mock. It is compared
+        against expected_body when match_body is set.
+        """
         if request.method.upper() != self.method:
             return False
 
@@ -54,12 +77,8 @@ class MockDefinition:
                 if request.headers.get(key) != value:
                     return False
 
-        if self.match_body and body:
-            try:
-                request_body = json.loads(request.body())
-                if request_body != body:
-                    return False
-            except (json.JSONDecodeError, ValueError):
+        if self.match_body and self.expected_body is not None:
+            if request_body != self.expected_body:
                 return False
 
         return True
@@ -67,16 +86,80 @@ class MockDefinition:
 class MockServer:
     def __init__(self):
         self._mocks: List[MockDefinition] = []
+        # method -> (mocks in registration order, combined path regex and the
+        # group index of each mock's alternative, or None if not combinable)
+        self._index: Optional[Dict[str, Tuple[List[MockDefinition], Any]]] = None
 
     def add_mock(self, mock: MockDefinition) -> None:
         self._mocks.append(mock)
+        self._index = None
 
     def clear_mocks(self) -> None:
         self._mocks.clear()
+        self._index = None
+
+    @staticmethod
+    def _combine(mocks: List[MockDefinition]) -> Optional[Tuple[Any, Dict[int, int]]]:
+        """Compile the mocks' path patterns into one alternation.
 
-    def get_mock(self, request: Request) -> Optional[MockDefinition]:
+        Alternatives are tried in order, so the first matching group is the
+        same mock a linear scan would find. Returns None when the patterns
+        can't be combined (e.g. numbered backreferences or inline flags).
+        """
+        parts = []
+        groups = {}
+        group_index = 1
+        for position, mock in enumerate(mocks):
+            if re.search(r'\\\d', mock.path_pattern.pattern):
+                return None
+            parts.append(f"({mock.path_pattern.pattern})")
+            groups[group_index] = position
+            group_index += 1 + mock.path_pattern.groups
+        try:
+            return re.compile('|'.join(parts)), groups
+        except re.error:
+            return None
+
+    def _build_index(self) -> Dict[str, Tuple[List[MockDefinition], Any]]:
+        by_method: Dict[str, List[MockDefinition]] = {}
         for mock in self._mocks:
-            if mock.matches(request, {}, {}):
+            by_method.setdefault(mock.method, []).append(mock)
+        return {
+            method: (mocks, self._combine(mocks))
+            for method, mocks in by_method.items()
+        }
+
+    def needs_body(self, method: str) -> bool:
+        """Whether any mock for the method matches on the request body"""
+        if self._index is None:
+            self._index = self._build_index()
+        entry = self._index.get(method.upper())
+        return entry is not None and any(mock.match_body for mock in entry[0])
+
+    def get_mock(
+        self,
+        request: Request,
+        body: Optional[Any] = None
+    ) -> Optional[MockDefinition]:
+        if self._index is None:
+            self._index = self._build_index()
+
+        entry = self._index.get(request.method.upper())
+        if entry is None:
+            return None
+        mocks, combined = entry
+
+        start = 0
+        if combined is not None:
+            pattern, groups = combined
+            match = pattern.match(request.url.path)
+            if match is None:
+                return None
+            # lastindex is the outermost group closed, i.e. the alternative
+            start = groups[match.lastindex]
+
+        for mock in mocks[start:]:
+            if mock.matches(request, {}, {}, request_body=body):
                 mock.call_count += 1
                 return mock
         return None
@@ -98,27 +181,41 @@ class MockMiddleware(BaseHTTPMiddleware):
         self.mock_server = mock_server or MockServer()
         self.enable_mocking = enable_mocking
 
+    @staticmethod
+    async def _parsed_body(request: Request) -> Optional[Any]:
+        """Parse the JSON body once, keeping it on request.state"""
+        try:
+            return request.state._cached_json
+        except AttributeError:
+            pass
+        try:
+            body = await request.json()
+        except (json.JSONDecodeError, ValueError):
+            body = None
+        request.state._cached_json = body
+        return body
+
     async def dispatch(self, request: Request, call_next) -> Response:
         if not self.enable_mocking:
             return await call_next(request)
 
-        mock = self.mock_server.get_mock(request)
+        body = None
+        if self.mock_server.needs_body(request.method):
+            body = await self._parsed_body(request)
+
+        mock = self.mock_server.get_mock(request, body)
         if not mock:
             return await call_next(request)
 
         if mock.response.delay > 0:
-            import asyncio
             await asyncio.sleep(mock.response.delay)
 
-        body = mock.response.body
-        if isinstance(body, dict):
-            body = json.dumps(body)
-
-        return Response(
-            content=body,
-            status_code=mock.response.status_code,
-            headers=mock.response.headers
+        response = Response(
+            content=mock.response._body_bytes,
+            status_code=mock.response.status_code
         )
+        response.raw_headers.extend(mock.response._raw_headers)
+        return response
 
 # Example usage:
 """
@@ -167,6 +264,20 @@ mock_server.add_mock(
     )
 )
 
+# Add a mock matching on the JSON request body
+mock_server.add_mock(
+    MockDefinition(
+        method="POST",
+        path="/api/users",
+        match_body=True,
+        expected_body={"name": "Test User"},
+        response=MockResponse(
+            status_code=201,
+            body={"id": 1, "name": "Test User"}
+        )
+    )
+)
+
 # Add the middleware to your FastAPI app
 app.add_middleware(
     MockMiddleware,
@@ -1,5 +1,7 @@
-from typing import Dict, Optional, Any
-import time
+from typing import Dict, Iterable, Optional, Any
+import asyncio
+from collections import deque
+from time import perf_counter_ns
 from dataclasses import dataclass, field
 from threading import Lock
 from fastapi import Request, Response
@@ -9,19 +11,22 @@ from app.core.metrics import MetricsCollector
 
 @dataclass
 class RequestStats:
+    """Per-path request counters; durations are integer nanoseconds"""
     total_requests: int = 0
     active_requests: int = 0
     success_count: int = 0
     error_count: int = 0
-    total_duration: float = 0.0
-    min_duration: float = float('inf')
-    max_duration: float = float('-inf')
+    total_duration_ns: int = 0
+    min_duration_ns: int = 0
+    max_duration_ns: int = 0
 
-    def update(self, duration: float, success: bool) -> None:
+    def update(self, duration_ns: int, success: bool) -> None:
         self.total_requests += 1
-        self.total_duration += duration
-        self.min_duration = min(self.min_duration, duration)
-        self.max_duration = max(self.max_duration, duration)
+        self.total_duration_ns += duration_ns
+        if self.total_requests == 1 or duration_ns < self.min_duration_ns:
+            self.min_duration_ns = duration_ns
+        if duration_ns > self.max_duration_ns:
+            self.max_duration_ns = duration_ns
         
         if success:
             self.success_count += 1
@@ -30,61 +35,92 @@ class RequestStats:
 
     @property
     def avg_duration(self) -> float:
-        return self.total_duration / self.total_requests if self.total_requests > 0 else 0.0
+        """Average duration in seconds"""
+        if self.total_requests == 0:
+            return 0.0
+        return self.total_duration_ns / self.total_requests / 1e9
+
+    @property
+    def min_duration(self) -> float:
+        return self.min_duration_ns / 1e9
+
+    @property
+    def max_duration(self) -> float:
+        return self.max_duration_ns / 1e9
 
     @property
     def success_rate(self) -> float:
         return self.success_count / self.total_requests if self.total_requests > 0 else 0.0
 
 class RequestMonitor:
+    """Tracks per-path request stats.
+
+    Counters on an existing RequestStats are updated without a lock; the
+    lock only guards adding paths to the stats dict and snapshotting it.
+    """
+
     def __init__(self, metrics_collector: Optional[MetricsCollector] = None):
         self._stats: Dict[str, RequestStats] = {}
         self._lock = Lock()
         self.metrics_collector = metrics_collector
 
-    def start_request(self, path: str) -> None:
+    def register_paths(self, paths: Iterable[str]) -> None:
+        """Preallocate stats, e.g. for every route at startup"""
         with self._lock:
-            if path not in self._stats:
-                self._stats[path] = RequestStats()
-            self._stats[path].active_requests += 1
+            for path in paths:
+                self._stats.setdefault(path, RequestStats())
+
+    def start_request(self, path: str) -> None:
+        stats = self._stats.get(path)
+        if stats is None:
+            # Double-checked: only the first request for a path takes the lock
+            with self._lock:
+                stats = self._stats.get(path)
+                if stats is None:
+                    stats = self._stats[path] = RequestStats()
+        stats.active_requests += 1
 
     def end_request(
         self,
         path: str,
-        duration: float,
+        duration_ns: int,
         status_code: int
     ) -> None:
-        with self._lock:
-            if path in self._stats:
-                self._stats[path].active_requests -= 1
-                self._stats[path].update(
-                    duration,
-                    200 <= status_code < 400
-                )
-
-                if self.metrics_collector:
-                    self.metrics_collector.record(
-                        'request.duration',
-                        duration,
-                        tags={'path': path}
-                    )
-                    self.metrics_collector.record(
-                        'request.active',
-                        self._stats[path].active_requests,
-                        tags={'path': path}
-                    )
+        stats = self._stats.get(path)
+        if stats is None:
+            return
+
+        stats.active_requests -= 1
+        stats.update(
+            duration_ns,
+            200 <= status_code < 400
+        )
+
+        if self.metrics_collector:
+            self.metrics_collector.record(
+                'request.duration',
+                duration_ns / 1e9,
+                tags={'path': path}
+            )
+            self.metrics_collector.record(
+                'request.active',
+                stats.active_requests,
+                tags={'path': path}
+            )
 
     def get_stats(self, path: Optional[str] = None) -> Dict[str, Any]:
+        if path:
+            stats = self._stats.get(path)
+            if stats is None:
+                return {}
+            return self._format_stats(path, stats)
+
         with self._lock:
-            if path:
-                if path not in self._stats:
-                    return {}
-                return self._format_stats(path, self._stats[path])
-            
-            return {
-                path: self._format_stats(path, stats)
-                for path, stats in self._stats.items()
-            }
+            snapshot = list(self._stats.items())
+        return {
+            path: self._format_stats(path, stats)
+            for path, stats in snapshot
+        }
 
     def _format_stats(self, path: str, stats: RequestStats) -> Dict[str, Any]:
         return {
@@ -95,8 +131,8 @@ class RequestMonitor:
             'error_count': stats.error_count,
             'success_rate': stats.success_rate,
             'avg_duration': stats.avg_duration,
-            'min_duration': stats.min_duration if stats.min_duration != float('inf') else 0,
-            'max_duration': stats.max_duration if stats.max_duration != float('-inf') else 0
+            'min_duration': stats.min_duration,
+            'max_duration': stats.max_duration
         }
 
 class MonitoringMiddleware(BaseHTTPMiddleware):
@@ -104,7 +140,9 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
         self,
         app,
         request_monitor: Optional[RequestMonitor] = None,
-        exclude_paths: Optional[set] = None
+        exclude_paths: Optional[set] = None,
+        slow_request_threshold: float = 1.0,
+        max_pending_slow_requests: int = 1024
     ):
         super().__init__(app)
         self.request_monitor = request_monitor or RequestMonitor()
@@ -115,34 +153,79 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
             '/redoc',
             '/openapi.json'
         }
+        self._slow_threshold_ns = int(slow_request_threshold * 1e9)
+        # Slow requests are queued here and logged by a background task so
+        # the request path never waits on logging; when full, the oldest
+        # entries are dropped and counted
+        self._slow_requests: deque = deque(maxlen=max_pending_slow_requests)
+        self.dropped_slow_requests = 0
+        self._slow_log_task: Optional[asyncio.Task] = None
+
+    def _start_slow_log(self) -> None:
+        if self._slow_log_task is None or self._slow_log_task.done():
+            self._slow_log_task = asyncio.create_task(self._slow_log_loop())
+
+    async def stop(self) -> None:
+        """Stop the slow request logger, logging anything still queued"""
+        if self._slow_log_task is not None:
+            self._slow_log_task.cancel()
+            try:
+                await self._slow_log_task
+            except asyncio.CancelledError:
+                pass
+            self._slow_log_task = None
+        self._log_slow_requests()
+
+    def _log_slow_requests(self) -> None:
+        slow_requests = self._slow_requests
+        while slow_requests:
+            method, path, duration_ns, status_code = slow_requests.popleft()
+            logger.warning(
+                f"Slow request detected: {method} {path}",
+                extra={
+                    'duration': duration_ns / 1e9,
+                    'status_code': status_code
+                }
+            )
+
+    async def _slow_log_loop(self) -> None:
+        """Log queued slow requests once a second"""
+        while True:
+            await asyncio.sleep(1.0)
+            try:
+                self._log_slow_requests()
+            except Exception as e:
+                logger.error(f"Error logging slow requests: {str(e)}")
 
     async def dispatch(self, request: Request, call_next) -> Response:
         if request.url.path in self.exclude_paths:
             return await call_next(request)
 
+        self._start_slow_log()
+
         path = request.url.path
-        start_time = time.time()
+        start_ns = perf_counter_ns()
         self.request_monitor.start_request(path)
+        status_code = 500
 
         try:
             response = await call_next(request)
+            status_code = response.status_code
             return response
             
         finally:
-            duration = time.time() - start_time
-            status_code = getattr(response, 'status_code', 500)
+            duration_ns = perf_counter_ns() - start_ns
             
             self.request_monitor.end_request(
                 path,
-                duration,
+                duration_ns,
                 status_code
             )
 
-            if duration > 1.0:  # Log slow requests
-                logger.warning(
-                    f"Slow request detected: {request.method} {path}",
-                    extra={
-                        'duration': duration,
-                        'status_code': status_code
-                    }
+            if duration_ns > self._slow_threshold_ns:  # Queue slow requests
+                slow_requests = self._slow_requests
+                if len(slow_requests) == slow_requests.maxlen:
+                    self.dropped_slow_requests += 1
+                slow_requests.append(
+                    (request.method, path, duration_ns, status_code)
                 ) 
\ No newline at end of file
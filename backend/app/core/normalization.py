@@ -1,5 +1,6 @@
-from typing import Dict, Optional, Any, List, Union, Callable
+from typing import Dict, Optional, Any, List, Tuple, Union, Callable
 from dataclasses import dataclass, field
+import orjson
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from app.core.logging import logger
@@ -11,9 +12,15 @@ class NormalizationRule:
     description: str
     apply_to_response: bool = False
 
+_NO_RULES: Dict[str, Tuple[List[NormalizationRule], List[NormalizationRule]]] = {}
+
 class RequestNormalizer:
     def __init__(self):
-        self._rules: Dict[str, List[NormalizationRule]] = {}
+        # method -> path -> (request rules, response rules); methods are
+        # stored upper-cased, as Starlette reports them
+        self._rules_by_method: Dict[
+            str, Dict[str, Tuple[List[NormalizationRule], List[NormalizationRule]]]
+        ] = {}
         self._default_normalizers = {
             'trim_whitespace': lambda x: x.strip() if isinstance(x, str) else x,
             'lowercase': lambda x: x.lower() if isinstance(x, str) else x,
@@ -29,10 +36,14 @@ class RequestNormalizer:
         method: str,
         rule: NormalizationRule
     ) -> None:
-        key = f"{method.upper()} {path}"
-        if key not in self._rules:
-            self._rules[key] = []
-        self._rules[key].append(rule)
+        rules = self._rules_by_method.setdefault(method.upper(), {}).setdefault(
+            path,
+            ([], [])
+        )
+        rules[1 if rule.apply_to_response else 0].append(rule)
+
+    def has_rules(self, method: str, path: str) -> bool:
+        return path in self._rules_by_method.get(method, _NO_RULES)
 
     def add_default_normalizer(
         self,
@@ -41,21 +52,43 @@ class RequestNormalizer:
     ) -> None:
         self._default_normalizers[name] = normalizer
 
-    def normalize_value(
-        self,
-        value: Any,
-        normalizer: Callable
-    ) -> Any:
+    def _normalize_leaf(self, value: Any, normalizer: Callable) -> Any:
         try:
-            if isinstance(value, list):
-                return [self.normalize_value(v, normalizer) for v in value]
-            elif isinstance(value, dict):
-                return {k: self.normalize_value(v, normalizer) for k, v in value.items()}
             return normalizer(value)
         except Exception as e:
             logger.error(f"Normalization error: {str(e)}")
             return value
 
+    def normalize_value(
+        self,
+        value: Any,
+        normalizer: Callable
+    ) -> Any:
+        if isinstance(value, list):
+            result = list(value)
+        elif isinstance(value, dict):
+            result = dict(value)
+        else:
+            return self._normalize_leaf(value, normalizer)
+
+        # Walk nested containers with an explicit stack instead of recursing;
+        # each container is copied before its values are replaced
+        stack = [result]
+        while stack:
+            container = stack.pop()
+            items = container.items() if isinstance(container, dict) else enumerate(container)
+            for key, item in items:
+                if isinstance(item, list):
+                    item = list(item)
+                    stack.append(item)
+                elif isinstance(item, dict):
+                    item = dict(item)
+                    stack.append(item)
+                else:
+                    item = self._normalize_leaf(item, normalizer)
+                container[key] = item
+        return result
+
     def normalize_data(
         self,
         request: Request,
@@ -65,20 +98,25 @@ class RequestNormalizer:
         if not data:
             return None
 
-        key = f"{request.method.upper()} {request.url.path}"
-        if key not in self._rules:
+        rules = self._rules_by_method.get(request.method, _NO_RULES).get(
+            request.scope['path']
+        )
+        if rules is None:
             return data
 
-        normalized = data.copy()
-        for rule in self._rules[key]:
-            if rule.apply_to_response != is_response:
-                continue
+        applicable = [
+            rule for rule in rules[1 if is_response else 0]
+            if rule.field in data
+        ]
+        if not applicable:
+            return data
 
-            if rule.field in normalized:
-                normalized[rule.field] = self.normalize_value(
-                    normalized[rule.field],
-                    rule.normalizer
-                )
+        normalized = data.copy()
+        for rule in applicable:
+            normalized[rule.field] = self.normalize_value(
+                normalized[rule.field],
+                rule.normalizer
+            )
 
         return normalized
 
@@ -99,29 +137,45 @@ class NormalizationMiddleware(BaseHTTPMiddleware):
             '/openapi.json'
         }
 
+    @staticmethod
+    def _with_body(response: Response, body: bytes) -> Response:
+        """Copy of response with a new body, reusing its raw headers"""
+        new_response = Response(status_code=response.status_code)
+        new_response.body = body
+        new_response.raw_headers = [
+            header for header in response.raw_headers
+            if header[0] != b'content-length'
+        ]
+        new_response.raw_headers.append(
+            (b'content-length', str(len(body)).encode('latin-1'))
+        )
+        return new_response
+
     async def dispatch(self, request: Request, call_next) -> Response:
-        if request.url.path in self.exclude_paths:
+        path = request.scope['path']
+        if path in self.exclude_paths:
+            return await call_next(request)
+
+        # Nothing registered for this route: don't touch either body
+        if not self.normalizer.has_rules(request.method, path):
             return await call_next(request)
 
         try:
             # Normalize request body
-            if request.method in ['POST', 'PUT', 'PATCH']:
+            if request.method in ('POST', 'PUT', 'PATCH'):
                 body_bytes = await request.body()
                 if body_bytes:
-                    import json
                     try:
-                        body = json.loads(body_bytes)
+                        body = orjson.loads(body_bytes)
                         normalized_body = self.normalizer.normalize_data(
                             request,
                             body,
                             is_response=False
                         )
                         
-                        if normalized_body:
-                            async def get_body():
-                                return json.dumps(normalized_body).encode()
-                            request._body = get_body
-                    except json.JSONDecodeError:
+                        if normalized_body is not None and normalized_body is not body:
+                            request._body = orjson.dumps(normalized_body)
+                    except orjson.JSONDecodeError:
                         pass
 
             # Get response
@@ -129,24 +183,27 @@ class NormalizationMiddleware(BaseHTTPMiddleware):
 
             # Normalize response body
             if response.headers.get('content-type') == 'application/json':
-                body = response.body.decode()
+                body = getattr(response, 'body', None)
+                streamed = body is None
+                if streamed:
+                    # call_next returns a streaming response; collect it once
+                    body = b''.join([chunk async for chunk in response.body_iterator])
                 try:
-                    data = json.loads(body)
+                    data = orjson.loads(body)
                     normalized_data = self.normalizer.normalize_data(
                         request,
                         data,
                         is_response=True
                     )
                     
-                    if normalized_data:
-                        return Response(
-                            content=json.dumps(normalized_data),
-                            status_code=response.status_code,
-                            headers=dict(response.headers)
-                        )
-                except json.JSONDecodeError:
+                    if normalized_data is not None and normalized_data is not data:
+                        return self._with_body(response, orjson.dumps(normalized_data))
+                except orjson.JSONDecodeError:
                     pass
 
+                if streamed:
+                    return self._with_body(response, body)
+
             return response
             
         except Exception as e:
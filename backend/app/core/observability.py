@@ -0,0 +1,186 @@
+from typing import Any, Dict, Iterable, Optional, Tuple
+import logging
+import time
+import orjson
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from starlette.responses import Response
+from app.core.health import HealthManager
+from app.core.metrics import MetricsManager
+from app.core.logging import logger, request_id_ctx
+
+class ObservabilityMiddleware:
+    """Pure ASGI middleware combining health, metrics and request logging
+
+    Replaces stacking HealthMiddleware, MetricsMiddleware and
+    LoggingMiddleware, each of which is a BaseHTTPMiddleware with its own
+    task group and wrapped send/receive. Status and response size are read
+    from the http.response.start message, so responses are never buffered.
+    """
+
+    def __init__(
+        self,
+        app,
+        health_manager: Optional[HealthManager] = None,
+        metrics_manager: Optional[MetricsManager] = None,
+        request_logger: Optional[logging.Logger] = None,
+        health_path: str = '/health',
+        metrics_path: str = '/metrics',
+        update_system_metrics: bool = True,
+        exclude_paths: Optional[Iterable[str]] = None
+    ):
+        self.app = app
+        self.health_manager = health_manager or HealthManager()
+        self.metrics_manager = metrics_manager or MetricsManager()
+        self.logger = request_logger or logging.getLogger('app')
+        self.update_system_metrics = update_system_metrics
+        self.exclude_paths = frozenset(exclude_paths or (
+            '/docs',
+            '/redoc',
+            '/openapi.json'
+        ))
+        # Paths answered directly by the middleware, dispatched by one lookup
+        self.fast_paths = {
+            health_path: self._health_response,
+            metrics_path: self._metrics_response
+        }
+
+    async def _health_response(self) -> Response:
+        results = await self.health_manager.check_health()
+        status_code = 200 if results['status'] == 'healthy' else 503
+        return Response(
+            content=orjson.dumps(results, option=orjson.OPT_UTC_Z),
+            status_code=status_code,
+            media_type='application/json'
+        )
+
+    async def _metrics_response(self) -> Response:
+        if self.update_system_metrics:
+            await self.metrics_manager.update_system_metrics()
+        return Response(
+            content=generate_latest(),
+            media_type=CONTENT_TYPE_LATEST
+        )
+
+    def _unhealthy_response(self) -> Response:
+        return Response(
+            content=orjson.dumps({
+                'error': 'Service unhealthy',
+                'details': self.health_manager._cached_result
+            }, option=orjson.OPT_UTC_Z),
+            status_code=503,
+            media_type='application/json'
+        )
+
+    @staticmethod
+    def _header_values(scope: Dict[str, Any]) -> Tuple[Optional[bytes], ...]:
+        """Get (content-length, x-request-id, user-agent) from raw headers"""
+        content_length = request_id = user_agent = None
+        for name, value in scope['headers']:
+            if name == b'content-length':
+                content_length = value
+            elif name == b'x-request-id':
+                request_id = value
+            elif name == b'user-agent':
+                user_agent = value
+        return content_length, request_id, user_agent
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        path = scope['path']
+        handler = self.fast_paths.get(path)
+        if handler is not None:
+            response = await handler()
+            return await response(scope, receive, send)
+
+        if path in self.exclude_paths:
+            return await self.app(scope, receive, send)
+
+        self.health_manager.start()
+        # Reject requests while the background checks report unhealthy
+        if not self.health_manager._healthy:
+            return await self._unhealthy_response()(scope, receive, send)
+
+        start_time = time.perf_counter()
+        method = scope['method']
+        content_length, request_id, user_agent = self._header_values(scope)
+        request_id = request_id.decode('latin-1') if request_id else 'unknown'
+        request_id_token = request_id_ctx.set(request_id)
+        # Evaluated once; skips building log payloads when INFO is muted
+        log_info = self.logger.isEnabledFor(logging.INFO)
+
+        if log_info:
+            client = scope.get('client')
+            self.logger.info(
+                "Request %s %s",
+                method,
+                path,
+                extra={
+                    'request_id': request_id,
+                    'method': method,
+                    'path': path,
+                    'query_string': scope.get('query_string', b'').decode('latin-1'),
+                    'client_ip': client[0] if client else None,
+                    'user_agent': user_agent.decode('latin-1') if user_agent else None
+                }
+            )
+
+        status_code = 500
+        response_size = None
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_size
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                for name, value in message.get('headers', ()):
+                    if name == b'content-length':
+                        if value.isdigit():
+                            response_size = int(value)
+                        break
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            self.logger.error(
+                "Request failed: %s",
+                e,
+                extra={
+                    'request_id': request_id,
+                    'error': str(e),
+                    'duration': time.perf_counter() - start_time
+                },
+                exc_info=True
+            )
+            raise
+        finally:
+            duration = time.perf_counter() - start_time
+            try:
+                # Label by route template (e.g. /users/{id}) so the number of
+                # series stays bounded by the declared routes
+                route = scope.get('route')
+                route_path = getattr(route, 'path', None) or 'unknown'
+                counter, duration_metric, request_size_metric, response_size_metric = (
+                    self.metrics_manager.request_metrics(method, route_path, status_code)
+                )
+                counter.inc()
+                duration_metric.observe(duration)
+                if content_length is not None and content_length.isdigit():
+                    request_size_metric.observe(int(content_length))
+                if response_size is not None:
+                    response_size_metric.observe(response_size)
+            except Exception as e:
+                logger.error("Error recording request metrics: %s", e)
+            request_id_ctx.reset(request_id_token)
+
+        if log_info:
+            self.logger.info(
+                "Response %s",
+                status_code,
+                extra={
+                    'request_id': request_id,
+                    'status_code': status_code,
+                    'duration': duration
+                }
+            )
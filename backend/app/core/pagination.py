@@ -1,12 +1,42 @@
 from typing import Dict, Optional, Any, List, Union, Callable, TypeVar
-from dataclasses import dataclass
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from dataclasses import dataclass, field
+import sys
+from urllib.parse import quote, urlencode
+import orjson
+from fastapi import Request
+from app.core.asgi import rewrite_json_response
 from app.core.logging import logger
 
 T = TypeVar('T')
 
-@dataclass
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def _base_url(scope: Dict[str, Any]) -> str:
+    """Scheme, host and path of the request URL, read straight from scope"""
+    scheme = scope.get('scheme', 'http')
+    host = None
+    for name, value in scope['headers']:
+        if name == b'host':
+            host = value.decode('latin-1')
+            break
+    if host is None:
+        server = scope.get('server')
+        if server is None:
+            host = ''
+        else:
+            server_host, port = server
+            host = (
+                server_host if port == _DEFAULT_PORTS.get(scheme)
+                else f"{server_host}:{port}"
+            )
+    raw_path = scope.get('raw_path')
+    if raw_path:
+        path = raw_path.decode('latin-1')
+    else:
+        path = quote(scope.get('root_path', '') + scope['path'])
+    return f"{scheme}://{host}{path}"
+
+@dataclass(slots=True)
 class PaginationConfig:
     default_limit: int = 10
     max_limit: int = 100
@@ -14,8 +44,10 @@ class PaginationConfig:
     limit_param: str = 'limit'
     include_total: bool = True
     key_func: Optional[Callable[[Request], str]] = None
+    # Filled in by RequestPaginator.add_config
+    link_template: str = field(default='', init=False, repr=False)
 
-@dataclass
+@dataclass(slots=True)
 class PaginationInfo:
     page: int
     limit: int
@@ -24,6 +56,8 @@ class PaginationInfo:
     has_prev: bool
 
 class PaginatedResponse:
+    __slots__ = ('items', 'info', 'links')
+
     def __init__(
         self,
         items: List[T],
@@ -58,8 +92,20 @@ class RequestPaginator:
         config: PaginationConfig
     ) -> None:
         key = f"{method.upper()} {path}"
+        # Param names are compared against every query key; interned
+        # strings let those comparisons short-circuit on identity
+        config.page_param = sys.intern(config.page_param)
+        config.limit_param = sys.intern(config.limit_param)
+        config.link_template = (
+            f"{{base}}{{query}}{config.page_param}={{page}}"
+            f"&{config.limit_param}={{limit}}"
+        )
         self._configs[key] = config
 
+    def has_config(self, method: str, path: str) -> bool:
+        """Whether responses for this route can be paginated at all"""
+        return f"{method.upper()} {path}" in self._configs
+
     def _get_pagination_params(
         self,
         request: Request,
@@ -81,24 +127,39 @@ class RequestPaginator:
         info: PaginationInfo,
         config: PaginationConfig
     ) -> Dict[str, str]:
-        base_url = str(request.url)
         links = {}
+        if not (info.has_prev or info.has_next):
+            return links
 
-        # Remove existing pagination params
-        for param in [config.page_param, config.limit_param]:
-            base_url = base_url.replace(f"{param}={request.query_params.get(param, '')}", "")
-        base_url = base_url.rstrip('?&')
-        separator = '?' if '?' not in base_url else '&'
+        # Keep every other query param (repeated ones included), re-encoded
+        # once; only the page number differs between the links
+        base_params = [
+            (key, value)
+            for key, value in request.query_params.multi_items()
+            if key != config.page_param and key != config.limit_param
+        ]
+        base = _base_url(request.scope)
+        query = f"?{urlencode(base_params)}&" if base_params else '?'
+        template = config.link_template
+        limit = info.limit
 
         if info.has_prev:
-            links['prev'] = f"{base_url}{separator}{config.page_param}={info.page-1}&{config.limit_param}={info.limit}"
-            links['first'] = f"{base_url}{separator}{config.page_param}=1&{config.limit_param}={info.limit}"
+            links['prev'] = template.format(
+                base=base, query=query, page=info.page - 1, limit=limit
+            )
+            links['first'] = template.format(
+                base=base, query=query, page=1, limit=limit
+            )
 
         if info.has_next:
-            links['next'] = f"{base_url}{separator}{config.page_param}={info.page+1}&{config.limit_param}={info.limit}"
+            links['next'] = template.format(
+                base=base, query=query, page=info.page + 1, limit=limit
+            )
             if info.total:
-                last_page = (info.total - 1) // info.limit + 1
-                links['last'] = f"{base_url}{separator}{config.page_param}={last_page}&{config.limit_param}={info.limit}"
+                last_page = (info.total - 1) // limit + 1
+                links['last'] = template.format(
+                    base=base, query=query, page=last_page, limit=limit
+                )
 
         return links
 
@@ -117,21 +178,28 @@ class RequestPaginator:
         try:
             # Handle both list and dict responses
             items = data if isinstance(data, list) else data.get('items', [])
-            total = len(items) if config.include_total else None
+            item_count = len(items)
+            total = item_count if config.include_total else None
 
             # Calculate slice indices
             start = (page - 1) * limit
             end = start + limit
 
-            # Get page items
-            page_items = items[start:end]
+            # Get page items; the common single-page case reuses the list
+            # as-is and pages past the end skip the slice
+            if start == 0 and item_count <= limit:
+                page_items = items
+            elif start >= item_count:
+                page_items = []
+            else:
+                page_items = items[start:end]
             
             # Create pagination info
             info = PaginationInfo(
                 page=page,
                 limit=limit,
                 total=total,
-                has_next=end < len(items),
+                has_next=end < item_count,
                 has_prev=page > 1
             )
 
@@ -148,53 +216,53 @@ class RequestPaginator:
             )
             return None
 
-class PaginationMiddleware(BaseHTTPMiddleware):
+class PaginationMiddleware:
+    """Pure ASGI middleware; only JSON responses are buffered"""
+
     def __init__(
         self,
         app,
         paginator: Optional[RequestPaginator] = None,
         exclude_paths: Optional[set] = None
     ):
-        super().__init__(app)
+        self.app = app
         self.paginator = paginator or RequestPaginator()
-        self.exclude_paths = exclude_paths or {
+        self.exclude_paths = frozenset(exclude_paths or (
             '/health',
             '/metrics',
             '/docs',
             '/redoc',
             '/openapi.json'
-        }
+        ))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.exclude_paths:
+            return await self.app(scope, receive, send)
 
-    async def dispatch(self, request: Request, call_next) -> Response:
-        if request.url.path in self.exclude_paths:
-            return await call_next(request)
+        # Only buffer responses of routes that have a pagination config
+        if not self.paginator.has_config(scope['method'], scope['path']):
+            return await self.app(scope, receive, send)
 
+        await rewrite_json_response(
+            self.app,
+            scope,
+            receive,
+            send,
+            lambda body: self._paginate_body(scope, body)
+        )
+
+    def _paginate_body(self, scope, body: bytes) -> Optional[bytes]:
         try:
-            # Get response
-            response = await call_next(request)
-
-            # Paginate response if it's JSON
-            if response.headers.get('content-type') == 'application/json':
-                body = response.body.decode()
-                try:
-                    import json
-                    data = json.loads(body)
-                    paginated_data = self.paginator.paginate_data(request, data)
-                    
-                    if paginated_data:
-                        return Response(
-                            content=json.dumps(paginated_data),
-                            status_code=response.status_code,
-                            headers=dict(response.headers)
-                        )
-                except json.JSONDecodeError:
-                    pass
-
-            return response
-            
+            data = orjson.loads(body)
+            paginated_data = self.paginator.paginate_data(Request(scope), data)
+
+            if paginated_data:
+                return orjson.dumps(paginated_data)
+        except orjson.JSONDecodeError:
+            pass
         except Exception as e:
             logger.error(f"Error in response pagination: {str(e)}")
-            return await call_next(request)
+        return None
 
 # Example usage:
 """
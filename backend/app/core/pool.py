@@ -1,5 +1,6 @@
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, List, Optional, Callable
 import time
+from collections import deque
 from threading import Lock
 from contextlib import contextmanager
 from app.core.errors import PoolError
@@ -11,17 +12,21 @@ class ConnectionPool:
         factory: Callable[[], Any],
         min_size: int = 5,
         max_size: int = 10,
-        timeout: int = 30
+        timeout: int = 30,
+        max_idle_time: int = 300
     ):
         self._factory = factory
         self._min_size = min_size
         self._max_size = max_size
         self._timeout = timeout
+        self._max_idle_time = max_idle_time
         
+        # Metadata for every open connection, keyed by id(connection)
         self._pool: Dict[int, Dict[str, Any]] = {}
-        self._in_use: Dict[int, bool] = {}
+        # Idle connections, least recently released on the left; acquiring
+        # pops from the right so the most recently used one is reused
+        self._idle: deque = deque()
         self._lock = Lock()
-        self._last_cleanup = time.time()
         
         # Initialize pool with minimum connections
         self._initialize_pool()
@@ -35,7 +40,7 @@ class ConnectionPool:
                     'created_at': time.time(),
                     'last_used': time.time()
                 }
-                self._in_use[id(conn)] = False
+                self._idle.append(conn)
 
     def _create_connection(self) -> Optional[Any]:
         try:
@@ -52,16 +57,12 @@ class ConnectionPool:
         try:
             with self._lock:
                 # Try to get an available connection
-                for cid, in_use in self._in_use.items():
-                    if not in_use:
-                        conn = self._pool[cid]['connection']
-                        conn_id = cid
-                        self._in_use[cid] = True
-                        self._pool[cid]['last_used'] = time.time()
-                        break
+                if self._idle:
+                    conn = self._idle.pop()
+                    conn_id = id(conn)
                 
                 # Create new connection if needed and possible
-                if conn is None and len(self._pool) < self._max_size:
+                elif len(self._pool) < self._max_size:
                     conn = self._create_connection()
                     if conn is not None:
                         conn_id = id(conn)
@@ -70,7 +71,6 @@ class ConnectionPool:
                             'created_at': time.time(),
                             'last_used': time.time()
                         }
-                        self._in_use[conn_id] = True
                 
                 if conn is None:
                     raise PoolError("No available connections")
@@ -79,31 +79,42 @@ class ConnectionPool:
             
         finally:
             if conn_id is not None:
+                now = time.time()
                 with self._lock:
-                    self._in_use[conn_id] = False
+                    self._pool[conn_id]['last_used'] = now
+                    self._idle.append(conn)
+                    # Expire stale idle connections while the lock is held
+                    # anyway; usually a single peek at the oldest entry
+                    expired = self._evict_idle(now, self._max_idle_time)
+                self._close_all(expired)
 
-    def cleanup(self, max_idle_time: int = 300) -> None:
+    def _evict_idle(self, now: float, max_idle_time: float) -> List[Any]:
+        """Detach idle connections above min_size; caller holds the lock"""
+        expired = []
+        # Idle order follows release time, so stop at the first fresh one
+        while (
+            self._idle and
+            len(self._pool) > self._min_size and
+            now - self._pool[id(self._idle[0])]['last_used'] > max_idle_time
+        ):
+            conn = self._idle.popleft()
+            del self._pool[id(conn)]
+            expired.append(conn)
+        return expired
+
+    @staticmethod
+    def _close_all(connections: List[Any]) -> None:
+        # Closing can block on the network, so it happens outside the lock
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.warning(f"Error closing connection: {str(e)}")
+
+    def cleanup(self, max_idle_time: Optional[int] = None) -> None:
+        """Expire idle connections now; releases already do this lazily"""
+        if max_idle_time is None:
+            max_idle_time = self._max_idle_time
         with self._lock:
-            now = time.time()
-            
-            # Don't cleanup too frequently
-            if now - self._last_cleanup < 60:
-                return
-                
-            self._last_cleanup = now
-            
-            # Remove idle connections above minimum pool size
-            idle_conns = [
-                cid for cid, in_use in self._in_use.items()
-                if not in_use and 
-                now - self._pool[cid]['last_used'] > max_idle_time and
-                len(self._pool) > self._min_size
-            ]
-            
-            for cid in idle_conns:
-                try:
-                    self._pool[cid]['connection'].close()
-                except Exception as e:
-                    logger.warning(f"Error closing connection: {str(e)}")
-                del self._pool[cid]
-                del self._in_use[cid] 
\ No newline at end of file
+            expired = self._evict_idle(time.time(), max_idle_time)
+        self._close_all(expired) 
\ No newline at end of file
@@ -1,15 +1,21 @@
 import os
+import time
 import signal
 import psutil
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from app.core.logging import logger
 
 class ProcessManager:
-    def __init__(self):
+    def __init__(self, slow_usage_ttl: float = 30.0):
         self.pid = os.getpid()
         self.process = psutil.Process(self.pid)
         self._shutdown_handlers = []
+        # open_files()/connections() walk /proc/<pid>/fd and parse the
+        # socket tables, so their result is reused for slow_usage_ttl seconds
+        self.slow_usage_ttl = slow_usage_ttl
+        self._slow_usage: Optional[Dict[str, Any]] = None
+        self._slow_usage_time = 0.0
 
     def register_shutdown_handler(self, handler):
         self._shutdown_handlers.append(handler)
@@ -27,17 +33,38 @@ class ProcessManager:
                 logger.error(f"Error in shutdown handler: {e}")
         os._exit(0)
 
-    def get_resource_usage(self):
-        try:
+    def get_fast_usage(self) -> Dict[str, Any]:
+        """Usage figures that only need the cheap /proc/<pid> stat reads"""
+        with self.process.oneshot():
             return {
-                'cpu_percent': self.process.cpu_percent(),
+                # interval=None compares against the previous call and
+                # never blocks
+                'cpu_percent': self.process.cpu_percent(interval=None),
                 'memory_percent': self.process.memory_percent(),
                 'num_threads': self.process.num_threads(),
+                'io_counters': self.process.io_counters()._asdict()
+            }
+
+    def get_slow_usage(self) -> Dict[str, Any]:
+        """Open file and connection counts, cached for slow_usage_ttl seconds"""
+        now = time.monotonic()
+        if (
+            self._slow_usage is None
+            or now - self._slow_usage_time >= self.slow_usage_ttl
+        ):
+            self._slow_usage = {
                 'open_files': len(self.process.open_files()),
-                'connections': len(self.process.connections()),
-                'io_counters': self.process.io_counters()._asdict(),
-                'timestamp': datetime.utcnow().isoformat()
+                'connections': len(self.process.connections())
             }
+            self._slow_usage_time = now
+        return self._slow_usage
+
+    def get_resource_usage(self):
+        try:
+            usage = self.get_fast_usage()
+            usage.update(self.get_slow_usage())
+            usage['timestamp'] = datetime.utcnow().isoformat()
+            return usage
         except Exception as e:
             logger.error(f"Error getting resource usage: {e}")
             return None
@@ -1,11 +1,13 @@
-from typing import Dict, Optional, Any, List
+from typing import Deque, Dict, Optional, Any, List
+from collections import deque
+from itertools import islice
 import time
+import heapq
+import random
 import cProfile
 import pstats
 import io
 from functools import wraps
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
 from app.core.logging import logger
 
 class Profiler:
@@ -22,12 +24,19 @@ class Profiler:
     def stop(self) -> None:
         self._profiler.disable()
         self._end_time = time.time()
-        self._stats = pstats.Stats(self._profiler)
-        self._stats.sort_stats('cumulative')
+
+    @property
+    def duration(self) -> float:
+        return self._end_time - self._start_time
 
     def get_stats(self, top_n: int = 10) -> Dict[str, Any]:
-        if not self._stats:
-            return {}
+        # pstats.Stats is built on first use, so profiles that are discarded
+        # (e.g. requests under min_duration) never pay for it
+        if self._stats is None:
+            if not self._end_time:
+                return {}
+            self._stats = pstats.Stats(self._profiler)
+            self._stats.sort_stats('cumulative')
 
         # Redirect stdout to capture stats output
         output = io.StringIO()
@@ -38,7 +47,7 @@ class Profiler:
         output.close()
 
         return {
-            'duration': self._end_time - self._start_time,
+            'duration': self.duration,
             'stats': stats_str,
             'top_functions': self._get_top_functions(top_n)
         }
@@ -47,23 +56,24 @@ class Profiler:
         if not self._stats:
             return []
 
-        functions = []
-        for func_stats in self._stats.stats.items():
-            ((file_name, line_number, func_name), (cc, nc, tt, ct, callers)) = func_stats
-            functions.append({
+        # Select on the raw pstats entries and only build dicts for the
+        # winners; a busy profile holds thousands of functions
+        top = heapq.nlargest(
+            limit,
+            self._stats.stats.items(),
+            key=lambda func_stats: func_stats[1][3]
+        )
+        return [
+            {
                 'file': file_name,
                 'line': line_number,
                 'function': func_name,
                 'calls': cc,
                 'time': tt,
                 'cumulative_time': ct
-            })
-
-        return sorted(
-            functions,
-            key=lambda x: x['cumulative_time'],
-            reverse=True
-        )[:limit]
+            }
+            for (file_name, line_number, func_name), (cc, nc, tt, ct, callers) in top
+        ]
 
 def profile(func):
     """Decorator to profile a function"""
@@ -85,63 +95,75 @@ def profile(func):
 
     return wrapper
 
-class ProfilerMiddleware(BaseHTTPMiddleware):
+class ProfilerMiddleware:
+    """Pure ASGI middleware profiling selected requests"""
+
     def __init__(
         self,
         app,
         enable_profiling: bool = False,
         profile_paths: Optional[set] = None,
-        min_duration: float = 1.0
+        min_duration: float = 1.0,
+        sample_rate: float = 1.0
     ):
-        super().__init__(app)
+        self.app = app
         self.enable_profiling = enable_profiling
-        self.profile_paths = profile_paths or set()
+        self.profile_paths = frozenset(profile_paths or ())
         self.min_duration = min_duration
+        # Fraction of matching requests to profile; cProfile hooks every
+        # function call, so production should only pay for a few of them
+        self.sample_rate = sample_rate
 
-    async def dispatch(self, request: Request, call_next) -> Response:
-        if not self.enable_profiling:
-            return await call_next(request)
+    async def __call__(self, scope, receive, send):
+        if not self.enable_profiling or scope['type'] != 'http':
+            return await self.app(scope, receive, send)
 
-        path = request.url.path
+        path = scope['path']
         if self.profile_paths and path not in self.profile_paths:
-            return await call_next(request)
+            return await self.app(scope, receive, send)
 
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return await self.app(scope, receive, send)
+
+        method = scope['method']
         profiler = Profiler()
         profiler.start()
 
         try:
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, send)
             
         finally:
             profiler.stop()
-            stats = profiler.get_stats()
             
-            if stats.get('duration', 0) >= self.min_duration:
+            if profiler.duration >= self.min_duration:
                 logger.info(
-                    f"Request profile: {request.method} {path}",
+                    f"Request profile: {method} {path}",
                     extra={
-                        'profile_stats': stats,
-                        'request_method': request.method,
+                        'profile_stats': profiler.get_stats(),
+                        'request_method': method,
                         'request_path': path
                     }
                 )
 
 class EndpointProfiler:
     def __init__(self):
-        self._profiles: Dict[str, List[Dict[str, Any]]] = {}
+        self._profiles: Dict[str, Deque[Dict[str, Any]]] = {}
         self._max_profiles = 100  # Keep last 100 profiles per endpoint
+        # Running sum of the retained durations, so averages are O(1)
+        self._duration_totals: Dict[str, float] = {}
 
     def add_profile(self, endpoint: str, profile_data: Dict[str, Any]) -> None:
-        if endpoint not in self._profiles:
-            self._profiles[endpoint] = []
-            
-        profiles = self._profiles[endpoint]
+        profiles = self._profiles.get(endpoint)
+        if profiles is None:
+            profiles = self._profiles[endpoint] = deque(maxlen=self._max_profiles)
+            self._duration_totals[endpoint] = 0.0
+
+        total = self._duration_totals[endpoint] + profile_data['duration']
+        # The deque drops the oldest profile itself once full
+        if len(profiles) == self._max_profiles:
+            total -= profiles[0]['duration']
         profiles.append(profile_data)
-        
-        # Keep only the last max_profiles
-        if len(profiles) > self._max_profiles:
-            profiles.pop(0)
+        self._duration_totals[endpoint] = total
 
     def get_profiles(
         self,
@@ -153,14 +175,18 @@ class EndpointProfiler:
                 return {}
             return {
                 'endpoint': endpoint,
-                'profiles': self._profiles[endpoint][-limit:]
+                'profiles': self._last(self._profiles[endpoint], limit)
             }
 
         return {
-            endpoint: profiles[-limit:]
+            endpoint: self._last(profiles, limit)
             for endpoint, profiles in self._profiles.items()
         }
 
+    @staticmethod
+    def _last(profiles: Deque[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        return list(islice(profiles, max(0, len(profiles) - limit), None))
+
     def get_summary(self, endpoint: str) -> Dict[str, Any]:
         if endpoint not in self._profiles:
             return {}
@@ -171,7 +197,7 @@ class EndpointProfiler:
         return {
             'endpoint': endpoint,
             'count': len(profiles),
-            'avg_duration': sum(durations) / len(durations),
+            'avg_duration': self._duration_totals[endpoint] / len(profiles),
             'min_duration': min(durations),
             'max_duration': max(durations),
             'last_profile': profiles[-1] if profiles else None
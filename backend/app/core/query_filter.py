@@ -1,16 +1,20 @@
-from typing import Dict, Optional, Any, List, Union, Callable
+from typing import Dict, Optional, Any, List, Tuple, Union, Callable
 from dataclasses import dataclass, field
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from urllib.parse import unquote_plus
+import orjson
+from app.core.asgi import rewrite_json_response
 from app.core.logging import logger
 
-@dataclass
+# Distinct query strings whose parsed filters are kept per QueryFilter
+PARSE_CACHE_SIZE = 1024
+
+@dataclass(slots=True)
 class FilterOperator:
     name: str
     func: Callable
     description: str
 
-@dataclass
+@dataclass(slots=True)
 class FilterField:
     name: str
     operators: List[str]
@@ -33,12 +37,17 @@ class QueryFilter:
             'startswith': FilterOperator('startswith', lambda x, y: x.startswith(y), 'Starts with'),
             'endswith': FilterOperator('endswith', lambda x, y: x.endswith(y), 'Ends with')
         }
+        # Raw query string -> parsed filters; polling clients repeat the same
+        # query, so most requests skip parsing entirely
+        self._parse_cache: Dict[bytes, Tuple[tuple[str, str, Any], ...]] = {}
 
     def add_field(self, field: FilterField) -> None:
         self._fields[field.name] = field
+        self._parse_cache.clear()
 
     def add_operator(self, operator: FilterOperator) -> None:
         self._operators[operator.name] = operator
+        self._parse_cache.clear()
 
     def _parse_filter_value(
         self,
@@ -60,8 +69,8 @@ class QueryFilter:
         filters = []
         
         for key, value in params.items():
-            if '__' in key:
-                field_name, operator = key.split('__')
+            field_name, separator, operator = key.rpartition('__')
+            if separator:
                 if (
                     field_name in self._fields and
                     operator in self._operators and
@@ -75,6 +84,29 @@ class QueryFilter:
             
         return filters
 
+    def parse_query_string(
+        self,
+        query_string: bytes
+    ) -> Tuple[tuple[str, str, Any], ...]:
+        """Parse filters from a raw query string, caching the result"""
+        filters = self._parse_cache.get(query_string)
+        if filters is None:
+            # Only field__operator pairs are percent-decoded; other params
+            # (tokens, sort fields, ...) are skipped at the bytes level
+            params = {}
+            for pair in query_string.split(b'&'):
+                key, _, value = pair.partition(b'=')
+                if b'__' in key:
+                    params[unquote_plus(key.decode('latin-1'))] = (
+                        unquote_plus(value.decode('latin-1'))
+                    )
+            filters = tuple(self._parse_query_params(params))
+            if len(self._parse_cache) >= PARSE_CACHE_SIZE:
+                # Evict the oldest entry (dicts keep insertion order)
+                del self._parse_cache[next(iter(self._parse_cache))]
+            self._parse_cache[query_string] = filters
+        return filters
+
     def apply_filters(
         self,
         data: List[Dict[str, Any]],
@@ -83,6 +115,24 @@ class QueryFilter:
         if not filters:
             return data
 
+        predicates = [
+            (field_name, self._operators[operator].func, value)
+            for field_name, operator, value in filters
+        ]
+        try:
+            # One pass over the data, every filter applied per item
+            return [
+                item for item in data
+                if all(
+                    field_name in item and func(item[field_name], value)
+                    for field_name, func, value in predicates
+                )
+            ]
+        except Exception:
+            # A filter raised (e.g. comparing mismatched types); fall back to
+            # one pass per filter so only the failing filter is skipped
+            pass
+
         filtered_data = data
         for field_name, operator, value in filters:
             try:
@@ -103,65 +153,76 @@ class QueryFilter:
 
         return filtered_data
 
-class QueryFilterMiddleware(BaseHTTPMiddleware):
+class QueryFilterMiddleware:
+    """Pure ASGI middleware; only filtered JSON responses are buffered"""
+
     def __init__(
         self,
         app,
         query_filter: Optional[QueryFilter] = None,
         exclude_paths: Optional[set] = None
     ):
-        super().__init__(app)
+        self.app = app
         self.query_filter = query_filter or QueryFilter()
-        self.exclude_paths = exclude_paths or {
+        self.exclude_paths = frozenset(exclude_paths or (
             '/health',
             '/metrics',
             '/docs',
             '/redoc',
             '/openapi.json'
-        }
+        ))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.exclude_paths:
+            return await self.app(scope, receive, send)
 
-    async def dispatch(self, request: Request, call_next) -> Response:
-        if request.url.path in self.exclude_paths:
-            return await call_next(request)
+        # Every filter param is field__operator; without '__' there is
+        # nothing to parse and the response passes through unbuffered
+        if b'__' not in scope['query_string']:
+            return await self.app(scope, receive, send)
 
         try:
             # Parse query filters
-            filters = self.query_filter._parse_query_params(
-                dict(request.query_params)
-            )
-
-            # Get response
-            response = await call_next(request)
-
-            # Apply filters to response if it's JSON
-            if filters and response.headers.get('content-type') == 'application/json':
-                body = response.body.decode()
-                try:
-                    import json
-                    data = json.loads(body)
-                    
-                    # Handle both list and dict responses
-                    if isinstance(data, list):
-                        filtered_data = self.query_filter.apply_filters(data, filters)
-                    elif isinstance(data, dict) and 'items' in data:
-                        data['items'] = self.query_filter.apply_filters(data['items'], filters)
-                        filtered_data = data
-                    else:
-                        filtered_data = data
-
-                    return Response(
-                        content=json.dumps(filtered_data),
-                        status_code=response.status_code,
-                        headers=dict(response.headers)
-                    )
-                except json.JSONDecodeError:
-                    pass
+            filters = self.query_filter.parse_query_string(scope['query_string'])
+        except Exception as e:
+            logger.error(f"Error in query filtering: {str(e)}")
+            filters = None
 
-            return response
-            
+        if not filters:
+            return await self.app(scope, receive, send)
+
+        await rewrite_json_response(
+            self.app,
+            scope,
+            receive,
+            send,
+            lambda body: self._filter_body(body, filters)
+        )
+
+    def _filter_body(
+        self,
+        body: bytes,
+        filters: Tuple[tuple[str, str, Any], ...]
+    ) -> Optional[bytes]:
+        try:
+            data = orjson.loads(body)
+
+            # Handle both list and dict responses
+            if isinstance(data, list):
+                filtered_data = self.query_filter.apply_filters(data, filters)
+            elif isinstance(data, dict) and 'items' in data:
+                data['items'] = self.query_filter.apply_filters(data['items'], filters)
+                filtered_data = data
+            else:
+                filtered_data = None
+
+            if filtered_data is not None:
+                return orjson.dumps(filtered_data)
+        except orjson.JSONDecodeError:
+            pass
         except Exception as e:
             logger.error(f"Error in query filtering: {str(e)}")
-            return await call_next(request)
+        return None
 
 # Example usage:
 """
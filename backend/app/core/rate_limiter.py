@@ -1,129 +1,273 @@
-from typing import Dict, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, TYPE_CHECKING
+import sys
+import math
 import time
 from threading import Lock
 from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
 from app.core.logging import logger
 from app.core.errors import RateLimitExceededError
 
+if TYPE_CHECKING:
+    import aioredis
+
+# Independent lock + dict pairs so unrelated clients never contend
+SHARD_COUNT = 64
+_SHARD_MASK = SHARD_COUNT - 1
+
+# The check never yields, so on the event loop bucket updates cannot
+# interleave; under the GIL a racing thread can at worst admit one extra
+# request. Shard locks are then only taken by cleanup. Free-threaded builds,
+# where a dict may be mutated truly concurrently, keep them on the hot path.
+_LOCK_BUCKETS = not getattr(sys, '_is_gil_enabled', lambda: True)()
+
+# Fixed-window counter shared by all workers: increment, start the window's
+# expiry on the first hit and report the remaining window, in one round trip
+_REDIS_CHECK_SCRIPT = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[1])
+end
+return {count, redis.call('PTTL', KEYS[1])}
+"""
+
+# How long to stay on the in-process limiter after Redis fails
+REDIS_RETRY_INTERVAL_NS = 5 * 1_000_000_000
+
 class RateLimiter:
+    """Token bucket limiter: rate_limit requests per window_size seconds
+
+    Each key's bucket holds up to rate_limit tokens and refills smoothly at
+    rate_limit / window_size tokens per second, so there is no window edge
+    at which a client can burst twice the limit.
+    """
+
     def __init__(
         self,
         rate_limit: int = 100,
         window_size: int = 60,
         by_ip: bool = True,
-        by_endpoint: bool = True
+        by_endpoint: bool = True,
+        redis_url: Optional[str] = None,
+        redis_prefix: str = 'ratelimit:'
     ):
-        self._requests: Dict[str, Tuple[int, float]] = {}
-        self._lock = Lock()
+        # Each shard maps key -> [tokens, last refill (monotonic ns)]; a
+        # list so the hot path updates it in place
+        self._shards: List[Tuple[Lock, Dict[str, List[float]]]] = [
+            (Lock(), {}) for _ in range(SHARD_COUNT)
+        ]
+        self._cleanup_lock = Lock()
+        self._next_cleanup_shard = 0
         self._rate_limit = rate_limit
         self._window_size = window_size
+        # Tokens regained per nanosecond
+        self._refill_rate = rate_limit / (window_size * 1_000_000_000)
         self._by_ip = by_ip
         self._by_endpoint = by_endpoint
-        self._last_cleanup = time.time()
-        self._cleanup_interval = 300  # 5 minutes
+        self._last_cleanup = time.monotonic_ns()
+        self._cleanup_interval_ns = 300 * 1_000_000_000 // SHARD_COUNT  # 5 minutes
+        # With a Redis URL the limit is enforced across all workers; the
+        # in-process buckets above remain the fallback
+        self.redis_url = redis_url
+        self.redis_prefix = redis_prefix
+        self._redis: Optional["aioredis.Redis"] = None
+        self._redis_script = None
+        self._redis_retry_at = 0
 
     def _get_key(self, request: Request) -> str:
+        scope = request.scope
         parts = []
         if self._by_ip:
-            parts.append(request.client.host)
+            client = scope.get('client')
+            parts.append(client[0] if client else 'unknown')
         if self._by_endpoint:
-            parts.append(f"{request.method}:{request.url.path}")
+            parts.append(f"{scope['method']}:{scope['path']}")
         return ":".join(parts)
 
+    async def check(self, request: Request) -> None:
+        """Check the request against Redis when configured, else in-process"""
+        if self.redis_url and time.monotonic_ns() >= self._redis_retry_at:
+            try:
+                return await self.check_rate_limit_redis(request)
+            except RateLimitExceededError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis rate limit error, using local limiter: {str(e)}")
+                if self._redis is not None:
+                    # Release the client's connection pool before dropping it
+                    try:
+                        await self._redis.close()
+                    except Exception:
+                        pass
+                self._redis = None
+                self._redis_script = None
+                self._redis_retry_at = time.monotonic_ns() + REDIS_RETRY_INTERVAL_NS
+        self.check_rate_limit(request)
+
+    async def check_rate_limit_redis(self, request: Request) -> None:
+        if self._redis is None:
+            # Imported here so the in-process limiter doesn't need aioredis
+            import aioredis
+
+            self._redis = await aioredis.from_url(self.redis_url)
+            # register_script runs EVALSHA and only sends the script body
+            # again if the server does not have it cached
+            self._redis_script = self._redis.register_script(_REDIS_CHECK_SCRIPT)
+
+        count, ttl_ms = await self._redis_script(
+            keys=[f"{self.redis_prefix}{self._get_key(request)}"],
+            args=[self._window_size * 1000]
+        )
+        if count > self._rate_limit:
+            retry_after = max(1, math.ceil(ttl_ms / 1000))
+            scope = request.scope
+            client = scope.get('client')
+            logger.warning(
+                f"Rate limit exceeded: {scope['method']} {scope['path']}",
+                extra={
+                    'client_ip': client[0] if client else None,
+                    'rate_limit': self._rate_limit,
+                    'window_size': self._window_size,
+                    'wait_time': retry_after
+                }
+            )
+            raise RateLimitExceededError(
+                f"Rate limit exceeded. Please wait {retry_after} seconds.",
+                retry_after=retry_after
+            )
+
     def check_rate_limit(self, request: Request) -> None:
         key = self._get_key(request)
-        now = time.time()
-        window_start = now - self._window_size
-
-        with self._lock:
-            self._cleanup_old_records()
-
-            if key not in self._requests:
-                self._requests[key] = (1, now)
-                return
-
-            count, last_request = self._requests[key]
-
-            if last_request < window_start:
-                self._requests[key] = (1, now)
-                return
-
-            if count >= self._rate_limit:
-                wait_time = int(window_start + self._window_size - now)
-                logger.warning(
-                    f"Rate limit exceeded: {request.method} {request.url.path}",
-                    extra={
-                        'client_ip': request.client.host,
-                        'rate_limit': self._rate_limit,
-                        'window_size': self._window_size,
-                        'wait_time': wait_time
-                    }
-                )
-                raise RateLimitExceededError(
-                    f"Rate limit exceeded. Please wait {wait_time} seconds."
-                )
-
-            self._requests[key] = (count + 1, now)
-
-    def _cleanup_old_records(self) -> None:
-        now = time.time()
-        if now - self._last_cleanup < self._cleanup_interval:
+        now_ns = time.monotonic_ns()
+
+        self._cleanup_old_records(now_ns)
+
+        lock, buckets = self._shards[hash(key) & _SHARD_MASK]
+        if _LOCK_BUCKETS:
+            with lock:
+                tokens = self._take_token(buckets, key, now_ns)
+        else:
+            tokens = self._take_token(buckets, key, now_ns)
+
+        if tokens < 1:
+            # Seconds until the bucket has a whole token again
+            retry_after = max(
+                1, math.ceil((1 - tokens) / self._refill_rate / 1_000_000_000)
+            )
+            scope = request.scope
+            client = scope.get('client')
+            logger.warning(
+                f"Rate limit exceeded: {scope['method']} {scope['path']}",
+                extra={
+                    'client_ip': client[0] if client else None,
+                    'rate_limit': self._rate_limit,
+                    'window_size': self._window_size,
+                    'wait_time': retry_after
+                }
+            )
+            raise RateLimitExceededError(
+                f"Rate limit exceeded. Please wait {retry_after} seconds.",
+                retry_after=retry_after
+            )
+
+    def _take_token(
+        self,
+        buckets: Dict[str, List[float]],
+        key: str,
+        now_ns: int
+    ) -> float:
+        """Refill the key's bucket and take a token if there is one
+
+        Returns the tokens available before taking; below 1 means rejected.
+        """
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = [self._rate_limit - 1, now_ns]
+            return self._rate_limit
+
+        # Refill lazily for the time since the last request
+        tokens = min(
+            self._rate_limit,
+            bucket[0] + (now_ns - bucket[1]) * self._refill_rate
+        )
+        bucket[0] = tokens - 1 if tokens >= 1 else tokens
+        bucket[1] = now_ns
+        return tokens
+
+    def _cleanup_old_records(self, now_ns: int) -> None:
+        """Drop buckets that have refilled completely, one shard at a time
+
+        A full bucket is indistinguishable from a missing one, so this only
+        reclaims memory for clients that stopped sending. Every shard is
+        still swept once per five minutes without walking all of them at once.
+        """
+        if now_ns - self._last_cleanup < self._cleanup_interval_ns:
+            return
+        # Another request is already sweeping; never block the hot path on it
+        if not self._cleanup_lock.acquire(blocking=False):
             return
 
         try:
-            window_start = now - self._window_size
-            self._requests = {
-                key: (count, timestamp)
-                for key, (count, timestamp) in self._requests.items()
-                if timestamp >= window_start
-            }
-            self._last_cleanup = now
+            self._last_cleanup = now_ns
+            index = self._next_cleanup_shard
+            self._next_cleanup_shard = (index + 1) & _SHARD_MASK
+            lock, buckets = self._shards[index]
+            with lock:
+                stale = [
+                    key for key, (tokens, last_ns) in buckets.items()
+                    if tokens + (now_ns - last_ns) * self._refill_rate >= self._rate_limit
+                ]
+                for key in stale:
+                    del buckets[key]
         except Exception as e:
             logger.error(f"Error cleaning up rate limit records: {str(e)}")
+        finally:
+            self._cleanup_lock.release()
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RateLimitMiddleware:
+    """Pure ASGI middleware enforcing a RateLimiter on HTTP requests"""
     def __init__(
         self,
         app,
         rate_limiter: Optional[RateLimiter] = None,
         exclude_paths: Optional[set] = None
     ):
-        super().__init__(app)
+        self.app = app
         self.rate_limiter = rate_limiter or RateLimiter()
-        self.exclude_paths = exclude_paths or {
+        self.exclude_paths = frozenset(exclude_paths or (
             '/health',
             '/metrics',
             '/docs',
             '/redoc',
             '/openapi.json'
-        }
+        ))
+        # The limits are fixed, so the header values are encoded once
+        self._limit_headers = (
+            (b'x-ratelimit-limit', str(self.rate_limiter._rate_limit).encode('latin-1')),
+            (b'x-ratelimit-window', str(self.rate_limiter._window_size).encode('latin-1'))
+        )
 
-    async def dispatch(self, request: Request, call_next) -> Response:
-        if request.url.path in self.exclude_paths:
-            return await call_next(request)
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.exclude_paths:
+            return await self.app(scope, receive, send)
 
         try:
-            self.rate_limiter.check_rate_limit(request)
-            response = await call_next(request)
-            
-            # Add rate limit headers
-            response.headers['X-RateLimit-Limit'] = str(
-                self.rate_limiter._rate_limit
-            )
-            response.headers['X-RateLimit-Window'] = str(
-                self.rate_limiter._window_size
-            )
-            
-            return response
-            
+            # Request only wraps the scope; the limiter reads nothing else
+            await self.rate_limiter.check(Request(scope))
         except RateLimitExceededError as e:
-            return Response(
+            response = Response(
                 content=str(e),
                 status_code=429,
-                headers={
-                    'Retry-After': str(
-                        int(time.time() + self.rate_limiter._window_size)
-                    )
-                }
-            ) 
\ No newline at end of file
+                # Delay in seconds (RFC 9110), not an absolute timestamp
+                headers={'Retry-After': str(e.retry_after)}
+            )
+            return await response(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                # Add rate limit headers
+                headers = list(message.get('headers', ()))
+                headers.extend(self._limit_headers)
+                message['headers'] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper) 
\ No newline at end of file
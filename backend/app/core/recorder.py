@@ -1,9 +1,10 @@
-from typing import Dict, Optional, Any, List
+from typing import Deque, Dict, Optional, Any, List
+from collections import Counter, deque
+from itertools import islice
 import time
 import json
 from dataclasses import dataclass, field
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers, QueryParams
 from app.core.logging import logger
 
 @dataclass
@@ -12,12 +13,15 @@ class RequestRecord:
     request_id: str = ""
     method: str = ""
     path: str = ""
-    query_params: Dict[str, str] = field(default_factory=dict)
-    headers: Dict[str, str] = field(default_factory=dict)
-    body: Optional[str] = None
+    # Raw ASGI query string and header lists, kept by reference; they are
+    # only decoded when a record is actually read back
+    query_string: bytes = b""
+    headers: Any = field(default_factory=list)
+    # Raw bytes, truncated to the middleware's max_body_bytes
+    body: Optional[bytes] = None
     response_status: int = 0
-    response_headers: Dict[str, str] = field(default_factory=dict)
-    response_body: Optional[str] = None
+    response_headers: Any = field(default_factory=list)
+    response_body: Optional[bytes] = None
     duration: float = 0.0
     error: Optional[str] = None
 
@@ -28,21 +32,39 @@ class RequestRecorder:
         record_bodies: bool = True,
         exclude_paths: Optional[set] = None
     ):
-        self._records: List[RequestRecord] = []
+        # Oldest record is dropped by the deque itself once full
+        self._records: Deque[RequestRecord] = deque(maxlen=max_records)
         self._max_records = max_records
+        # Running totals over the retained records, updated on add/evict
+        self._success_count = 0
+        self._duration_total = 0.0
+        self._status_codes: Counter = Counter()
         self._record_bodies = record_bodies
-        self.exclude_paths = exclude_paths or {
+        self.exclude_paths = frozenset(exclude_paths or (
             '/health',
             '/metrics',
             '/docs',
             '/redoc',
             '/openapi.json'
-        }
+        ))
 
     def add_record(self, record: RequestRecord) -> None:
-        self._records.append(record)
-        if len(self._records) > self._max_records:
-            self._records.pop(0)
+        records = self._records
+        if len(records) == records.maxlen:
+            # Undo the contribution of the record the deque is about to drop
+            evicted = records[0]
+            if 200 <= evicted.response_status < 400:
+                self._success_count -= 1
+            self._duration_total -= evicted.duration
+            self._status_codes[evicted.response_status] -= 1
+            if not self._status_codes[evicted.response_status]:
+                del self._status_codes[evicted.response_status]
+
+        records.append(record)
+        if 200 <= record.response_status < 400:
+            self._success_count += 1
+        self._duration_total += record.duration
+        self._status_codes[record.response_status] += 1
 
     def get_records(
         self,
@@ -51,16 +73,21 @@ class RequestRecorder:
         status_code: Optional[int] = None,
         limit: int = 100
     ) -> List[Dict[str, Any]]:
-        filtered = self._records
-
-        if method:
-            filtered = [r for r in filtered if r.method == method.upper()]
-        if path:
-            filtered = [r for r in filtered if r.path == path]
-        if status_code:
-            filtered = [r for r in filtered if r.response_status == status_code]
-
-        return [self._format_record(r) for r in filtered[-limit:]]
+        method = method.upper() if method else None
+
+        # One pass from the newest record back, stopping after `limit` matches
+        matches = islice(
+            (
+                r for r in reversed(self._records)
+                if (not method or r.method == method)
+                and (not path or r.path == path)
+                and (not status_code or r.response_status == status_code)
+            ),
+            limit
+        )
+        latest = list(matches)
+        latest.reverse()
+        return [self._format_record(r) for r in latest]
 
     def _format_record(self, record: RequestRecord) -> Dict[str, Any]:
         return {
@@ -68,83 +95,120 @@ class RequestRecorder:
             'request_id': record.request_id,
             'method': record.method,
             'path': record.path,
-            'query_params': record.query_params,
-            'headers': record.headers,
-            'body': record.body if self._record_bodies else None,
+            'query_params': dict(QueryParams(record.query_string)),
+            'headers': dict(Headers(raw=record.headers)),
+            'body': self._decode_body(record.body),
             'response_status': record.response_status,
-            'response_headers': record.response_headers,
-            'response_body': record.response_body if self._record_bodies else None,
+            'response_headers': dict(Headers(raw=record.response_headers)),
+            'response_body': self._decode_body(record.response_body),
             'duration': record.duration,
             'error': record.error
         }
 
+    def _decode_body(self, body: Optional[bytes]) -> Optional[str]:
+        if body is None or not self._record_bodies:
+            return None
+        # A truncated body may end mid-character
+        return body.decode('utf-8', 'replace')
+
     def get_statistics(self) -> Dict[str, Any]:
         if not self._records:
             return {}
 
         total = len(self._records)
-        success = sum(1 for r in self._records if 200 <= r.response_status < 400)
-        durations = [r.duration for r in self._records]
+        success = self._success_count
+
+        # Min/max cannot be kept up to date under eviction; one pass for both
+        min_duration = max_duration = self._records[0].duration
+        for r in self._records:
+            duration = r.duration
+            if duration < min_duration:
+                min_duration = duration
+            elif duration > max_duration:
+                max_duration = duration
 
         return {
             'total_requests': total,
             'success_count': success,
             'error_count': total - success,
-            'avg_duration': sum(durations) / total,
-            'min_duration': min(durations),
-            'max_duration': max(durations),
-            'status_codes': {
-                status: sum(1 for r in self._records if r.response_status == status)
-                for status in set(r.response_status for r in self._records)
-            }
+            'avg_duration': self._duration_total / total,
+            'min_duration': min_duration,
+            'max_duration': max_duration,
+            'status_codes': dict(self._status_codes)
         }
 
-class RecorderMiddleware(BaseHTTPMiddleware):
+class RecorderMiddleware:
+    """Pure ASGI middleware recording requests and responses
+
+    Bodies are captured from the receive/send messages as they stream past,
+    so streaming responses are recorded too; at most max_body_bytes of each
+    body are kept.
+    """
+
     def __init__(
         self,
         app,
         recorder: Optional[RequestRecorder] = None,
-        enable_recording: bool = True
+        enable_recording: bool = True,
+        max_body_bytes: int = 64 * 1024
     ):
-        super().__init__(app)
+        self.app = app
         self.recorder = recorder or RequestRecorder()
         self.enable_recording = enable_recording
+        self.max_body_bytes = max_body_bytes
 
-    async def dispatch(self, request: Request, call_next) -> Response:
-        if not self.enable_recording or request.url.path in self.recorder.exclude_paths:
-            return await call_next(request)
+    async def __call__(self, scope, receive, send):
+        if (
+            scope['type'] != 'http'
+            or not self.enable_recording
+            or scope['path'] in self.recorder.exclude_paths
+        ):
+            return await self.app(scope, receive, send)
 
-        start_time = time.time()
+        start_ns = time.monotonic_ns()
         record = RequestRecord(
-            request_id=getattr(request.state, 'request_id', ''),
-            method=request.method,
-            path=str(request.url.path),
-            query_params=dict(request.query_params),
-            headers=dict(request.headers)
+            request_id=scope.get('state', {}).get('request_id', ''),
+            method=scope['method'],
+            path=scope['path'],
+            query_string=scope['query_string'],
+            headers=scope['headers']
         )
 
+        if not self.recorder._record_bodies:
+            receive_wrapper = receive
+            request_body = response_body = None
+        else:
+            max_body_bytes = self.max_body_bytes
+            request_body = bytearray()
+            response_body = bytearray()
+
+            async def receive_wrapper():
+                message = await receive()
+                if message['type'] == 'http.request':
+                    room = max_body_bytes - len(request_body)
+                    if room > 0:
+                        request_body.extend(message.get('body', b'')[:room])
+                return message
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                record.response_status = message['status']
+                record.response_headers = message.get('headers', [])
+            elif response_body is not None and message['type'] == 'http.response.body':
+                room = max_body_bytes - len(response_body)
+                if room > 0:
+                    response_body.extend(message.get('body', b'')[:room])
+            await send(message)
+
         try:
-            # Record request body if available
-            if request.method in ['POST', 'PUT', 'PATCH']:
-                body = await request.body()
-                record.body = body.decode()
-
-            response = await call_next(request)
-
-            # Record response details
-            record.response_status = response.status_code
-            record.response_headers = dict(response.headers)
-            
-            # Try to record response body
-            if hasattr(response, 'body'):
-                record.response_body = response.body.decode()
-
-            return response
-            
+            await self.app(scope, receive_wrapper, send_wrapper)
         except Exception as e:
             record.error = str(e)
             raise
-            
         finally:
-            record.duration = time.time() - start_time
-            self.recorder.add_record(record) 
\ No newline at end of file
+            if request_body:
+                record.body = bytes(request_body)
+            if response_body:
+                record.response_body = bytes(response_body)
+            record.duration = (time.monotonic_ns() - start_ns) * 1e-9
+            self.recorder.add_record(record)
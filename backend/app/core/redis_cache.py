@@ -1,11 +1,21 @@
-from typing import Dict, Optional, Any, Union
-import json
+from typing import Dict, List, Optional, Any, Tuple, Union
+import time
+from hashlib import blake2b
+import orjson
 import aioredis
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
 from app.core.logging import logger
 from app.core.caching import CacheBackend
 
+# Keys per MGET, keeping the command's argument list bounded
+MGET_BATCH_SIZE = 1000
+
+# Local cache in front of Redis: hot entries are served for at most
+# L1_TTL seconds, and a known miss skips Redis for NEGATIVE_TTL seconds
+L1_MAX_ENTRIES = 1024
+L1_TTL = 10
+NEGATIVE_TTL = 1
+
 class RedisCache(CacheBackend):
     def __init__(
         self,
@@ -16,8 +26,8 @@ class RedisCache(CacheBackend):
     ):
         self.redis_url = redis_url
         self.prefix = prefix
-        self.serializer = serializer or json.dumps
-        self.deserializer = deserializer or json.loads
+        self.serializer = serializer or orjson.dumps
+        self.deserializer = deserializer or orjson.loads
         self._redis: Optional[aioredis.Redis] = None
 
     async def connect(self) -> None:
@@ -30,7 +40,7 @@ class RedisCache(CacheBackend):
             self._redis = None
 
     def _get_key(self, key: str) -> str:
-        return f"{self.prefix}{key}"
+        return self.prefix + key
 
     async def get(self, key: str) -> Optional[bytes]:
         try:
@@ -80,10 +90,14 @@ class RedisCache(CacheBackend):
     ) -> Dict[str, Optional[bytes]]:
         try:
             await self.connect()
-            pipe = self._redis.pipeline()
-            for key in keys:
-                pipe.get(self._get_key(key))
-            values = await pipe.execute()
+            prefix = self.prefix
+            prefixed_keys = [prefix + key for key in keys]
+            # One MGET per batch instead of one GET per key
+            values = []
+            for start in range(0, len(prefixed_keys), MGET_BATCH_SIZE):
+                values.extend(await self._redis.mget(
+                    prefixed_keys[start:start + MGET_BATCH_SIZE]
+                ))
             return dict(zip(keys, values))
         except Exception as e:
             logger.error(f"Redis get_many error: {str(e)}")
@@ -95,79 +109,181 @@ class RedisCache(CacheBackend):
     ) -> None:
         try:
             await self.connect()
-            pipe = self._redis.pipeline()
+            # There is no MSET with per-key TTLs; a single MULTI/EXEC pipeline
+            # sends every SETEX in one write
+            pipe = self._redis.pipeline(transaction=True)
+            prefix = self.prefix
+            setex = pipe.setex
             for key, (value, ttl) in mapping.items():
-                pipe.setex(self._get_key(key), ttl, value)
+                setex(prefix + key, ttl, value)
             await pipe.execute()
         except Exception as e:
             logger.error(f"Redis set_many error: {str(e)}")
 
-class RedisCacheMiddleware(BaseHTTPMiddleware):
+class RedisCacheMiddleware:
+    """Pure ASGI middleware caching successful JSON GET responses in Redis
+
+    The response is captured from the send messages as it streams past, so
+    nothing is re-read or decoded. Entries are an orjson header line
+    (status and raw headers) followed by the raw body bytes.
+    """
+
     def __init__(
         self,
         app,
         redis_url: str,
         prefix: str = 'cache:',
         ttl: int = 300,
-        exclude_paths: Optional[set] = None
+        exclude_paths: Optional[set] = None,
+        max_body_bytes: int = 1024 * 1024
     ):
-        super().__init__(app)
+        self.app = app
         self.cache = RedisCache(redis_url, prefix)
         self.ttl = ttl
-        self.exclude_paths = exclude_paths or {
+        self.max_body_bytes = max_body_bytes
+        # cache key -> (expiry, monotonic ns; encoded entry or None for a
+        # known miss). Holds raw bytes only, bounded by L1_MAX_ENTRIES.
+        self._l1: Dict[str, Tuple[int, Optional[bytes]]] = {}
+        self._l1_ttl_ns = min(ttl, L1_TTL) * 1_000_000_000
+        self.exclude_paths = frozenset(exclude_paths or (
             '/health',
             '/metrics',
             '/docs',
             '/redoc',
             '/openapi.json'
-        }
+        ))
+
+    @staticmethod
+    def _cache_key(scope) -> Tuple[str, str]:
+        """Fixed-size hashed key plus the full key it was derived from
+
+        The full key is stored inside the entry and compared on read, so a
+        64-bit hash collision can only cause a miss, never a wrong response.
+        """
+        full_key = b'\x1f'.join((
+            scope['method'].encode('latin-1'),
+            scope['path'].encode('utf-8'),
+            scope['query_string']
+        )).decode('latin-1')
+        digest = blake2b(full_key.encode('latin-1'), digest_size=8).hexdigest()
+        return digest, full_key
+
+    @staticmethod
+    def _encode_entry(
+        full_key: str,
+        status: int,
+        headers: List[Tuple[bytes, bytes]],
+        body: bytes
+    ) -> bytes:
+        meta = orjson.dumps({
+            'key': full_key,
+            'status_code': status,
+            'headers': [
+                [name.decode('latin-1'), value.decode('latin-1')]
+                for name, value in headers
+            ]
+        })
+        # orjson never emits a raw newline, so the first one ends the meta
+        return meta + b'\n' + body
+
+    @staticmethod
+    def _decode_entry(
+        entry: bytes
+    ) -> Tuple[str, int, List[Tuple[bytes, bytes]], bytes]:
+        meta, _, body = entry.partition(b'\n')
+        data = orjson.loads(meta)
+        headers = [
+            (name.encode('latin-1'), value.encode('latin-1'))
+            for name, value in data['headers']
+        ]
+        return data.get('key'), data['status_code'], headers, body
+
+    def _l1_set(self, key: str, entry: Optional[bytes], ttl_ns: int) -> None:
+        l1 = self._l1
+        if key not in l1 and len(l1) >= L1_MAX_ENTRIES:
+            # Evict the oldest entry (dicts keep insertion order)
+            del l1[next(iter(l1))]
+        l1[key] = (time.monotonic_ns() + ttl_ns, entry)
 
-    async def dispatch(self, request: Request, call_next) -> Response:
-        if request.url.path in self.exclude_paths:
-            return await call_next(request)
+    async def _lookup(self, key: str) -> Optional[bytes]:
+        """Find an entry in the local cache, then in Redis"""
+        local = self._l1.get(key)
+        if local is not None:
+            expires_ns, entry = local
+            if expires_ns > time.monotonic_ns():
+                return entry
+            del self._l1[key]
+
+        entry = await self.cache.get(key)
+        if entry:
+            self._l1_set(key, entry, self._l1_ttl_ns)
+        else:
+            entry = None
+            self._l1_set(key, None, NEGATIVE_TTL * 1_000_000_000)
+        return entry
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.exclude_paths:
+            return await self.app(scope, receive, send)
 
         # Only cache GET requests
-        if request.method != 'GET':
-            return await call_next(request)
+        if scope['method'] != 'GET':
+            return await self.app(scope, receive, send)
 
-        try:
-            # Generate cache key
-            cache_key = f"{request.method}:{request.url.path}:{request.query_params}"
-            
-            # Try to get from cache
-            cached_response = await self.cache.get(cache_key)
-            if cached_response:
-                data = json.loads(cached_response)
-                return Response(
-                    content=data['body'],
-                    status_code=data['status_code'],
-                    headers=data['headers']
-                )
-
-            # Get fresh response
-            response = await call_next(request)
-
-            # Cache successful JSON responses
-            if (
-                response.status_code == 200 and
-                response.headers.get('content-type') == 'application/json'
-            ):
-                cache_data = {
-                    'body': response.body.decode(),
-                    'status_code': response.status_code,
-                    'headers': dict(response.headers)
-                }
-                await self.cache.set(
-                    cache_key,
-                    json.dumps(cache_data).encode(),
-                    self.ttl
-                )
-
-            return response
-            
-        except Exception as e:
-            logger.error(f"Error in Redis cache middleware: {str(e)}")
-            return await call_next(request)
+        # Generate cache key
+        cache_key, full_key = self._cache_key(scope)
+
+        # Try to get from cache
+        cached_response = await self._lookup(cache_key)
+        if cached_response:
+            try:
+                entry_key, status_code, headers, body = self._decode_entry(cached_response)
+            except Exception as e:
+                logger.error(f"Error in Redis cache middleware: {str(e)}")
+                entry_key = None
+            # A different full key means a hash collision; treat it as a miss
+            if entry_key == full_key:
+                await send({
+                    'type': 'http.response.start',
+                    'status': status_code,
+                    'headers': headers
+                })
+                await send({'type': 'http.response.body', 'body': body})
+                return
+
+        start_message = None
+        body = bytearray()
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message['type'] == 'http.response.start':
+                # Cache successful JSON responses
+                if (
+                    message['status'] == 200 and
+                    Headers(raw=message.get('headers', [])).get('content-type') == 'application/json'
+                ):
+                    start_message = message
+            elif start_message is not None and message['type'] == 'http.response.body':
+                body.extend(message.get('body', b''))
+                if len(body) > self.max_body_bytes:
+                    # Too large to cache; stop collecting
+                    start_message = None
+                    body.clear()
+                elif not message.get('more_body', False):
+                    # Let the client have the response before writing to Redis
+                    await send(message)
+                    entry = self._encode_entry(
+                        full_key,
+                        start_message['status'],
+                        start_message['headers'],
+                        bytes(body)
+                    )
+                    self._l1_set(cache_key, entry, self._l1_ttl_ns)
+                    await self.cache.set(cache_key, entry, self.ttl)
+                    return
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
 
 # Example usage:
 """
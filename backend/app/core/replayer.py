@@ -1,19 +1,19 @@
-from typing import Dict, Optional, Any, List, Union
+from typing import Dict, Optional, Any, List, Tuple, Union
 import time
-import json
+import asyncio
 import aiohttp
 from dataclasses import dataclass, field
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
 from app.core.logging import logger
 
 @dataclass
 class ReplayRequest:
     method: str
     url: str
-    headers: Dict[str, str] = field(default_factory=dict)
-    query_params: Dict[str, str] = field(default_factory=dict)
-    body: Optional[Union[Dict[str, Any], str]] = None
+    # Mapping or (name, value) pairs; the query may be a pre-encoded string
+    headers: Union[Dict[str, str], List[Tuple[str, str]]] = field(default_factory=dict)
+    query_params: Union[Dict[str, str], str] = field(default_factory=dict)
+    # A dict is sent as JSON; str/bytes are sent as-is (e.g. a captured body)
+    body: Optional[Union[Dict[str, Any], str, bytes]] = None
 
 @dataclass
 class ReplayResponse:
@@ -21,6 +21,7 @@ class ReplayResponse:
     headers: Dict[str, str]
     body: Optional[str]
     duration: float
+    raw_body: bytes = b''
 
 class RequestReplayer:
     def __init__(
@@ -61,17 +62,18 @@ class RequestReplayer:
                 headers=request.headers,
                 params=request.query_params,
                 json=request.body if isinstance(request.body, dict) else None,
-                data=request.body if isinstance(request.body, str) else None,
+                data=request.body if isinstance(request.body, (str, bytes)) else None,
                 ssl=self.verify_ssl
             ) as response:
                 duration = time.time() - start_time
-                body = await response.text()
+                raw_body = await response.read()
 
                 return ReplayResponse(
                     status_code=response.status,
                     headers=dict(response.headers),
-                    body=body,
-                    duration=duration
+                    body=raw_body.decode(response.charset or 'utf-8', 'replace'),
+                    duration=duration,
+                    raw_body=raw_body
                 )
 
         except Exception as e:
@@ -85,7 +87,13 @@ class RequestReplayer:
             )
             raise
 
-class ReplayMiddleware(BaseHTTPMiddleware):
+class ReplayMiddleware:
+    """Pure ASGI middleware replaying requests against target_url
+
+    Request and response bodies are captured from the receive/send messages,
+    so streaming responses are compared too.
+    """
+
     def __init__(
         self,
         app,
@@ -93,63 +101,117 @@ class ReplayMiddleware(BaseHTTPMiddleware):
         enable_replay: bool = False,
         record_differences: bool = True
     ):
-        super().__init__(app)
+        self.app = app
         self.target_url = target_url
         self.enable_replay = enable_replay
         self.record_differences = record_differences
         self.differences: List[Dict[str, Any]] = []
+        # One replayer (and aiohttp session) for all requests so connections
+        # to the target are kept alive; created lazily inside the event loop
+        self._replayer: Optional[RequestReplayer] = None
+        # Stops concurrent first requests each opening a session of their own
+        self._replayer_lock = asyncio.Lock()
+
+    @staticmethod
+    def _is_open(replayer: Optional[RequestReplayer]) -> bool:
+        return (
+            replayer is not None
+            and replayer._session is not None
+            and not replayer._session.closed
+        )
 
-    async def dispatch(self, request: Request, call_next) -> Response:
-        if not self.enable_replay:
-            return await call_next(request)
-
-        # Get original response
-        original_response = await call_next(request)
-        
-        if self.record_differences:
-            try:
-                # Prepare replay request
-                replay_request = ReplayRequest(
-                    method=request.method,
-                    url=request.url.path,
-                    headers=dict(request.headers),
-                    query_params=dict(request.query_params)
-                )
+    async def _get_replayer(self) -> RequestReplayer:
+        replayer = self._replayer
+        if self._is_open(replayer):
+            return replayer
+        async with self._replayer_lock:
+            replayer = self._replayer
+            if not self._is_open(replayer):
+                replayer = await RequestReplayer(self.target_url).__aenter__()
+                self._replayer = replayer
+        return replayer
+
+    async def close(self) -> None:
+        """Close the shared replay session, e.g. on application shutdown"""
+        if self._replayer is not None:
+            await self._replayer.__aexit__(None, None, None)
+            self._replayer = None
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope['type'] != 'http'
+            or not self.enable_replay
+            or not self.record_differences
+        ):
+            return await self.app(scope, receive, send)
+
+        method = scope['method']
+        request_body = bytearray()
+        response_status = 0
+        response_body = bytearray()
+
+        async def receive_wrapper():
+            message = await receive()
+            if message['type'] == 'http.request':
+                request_body.extend(message.get('body', b''))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal response_status
+            if message['type'] == 'http.response.start':
+                response_status = message['status']
+            elif message['type'] == 'http.response.body':
+                response_body.extend(message.get('body', b''))
+            await send(message)
+
+        # Get original response; it reaches the client before the replay
+        await self.app(scope, receive_wrapper, send_wrapper)
 
-                if request.method in ['POST', 'PUT', 'PATCH']:
-                    body = await request.body()
-                    try:
-                        replay_request.body = json.loads(body)
-                    except json.JSONDecodeError:
-                        replay_request.body = body.decode()
-
-                # Replay request
-                async with RequestReplayer(self.target_url) as replayer:
-                    replay_response = await replayer.replay_request(replay_request)
-
-                # Compare responses
-                if (
-                    original_response.status_code != replay_response.status_code or
-                    original_response.body.decode() != replay_response.body
-                ):
-                    self.differences.append({
-                        'timestamp': time.time(),
-                        'path': request.url.path,
-                        'method': request.method,
-                        'original': {
-                            'status_code': original_response.status_code,
-                            'body': original_response.body.decode()
-                        },
-                        'replay': {
-                            'status_code': replay_response.status_code,
-                            'body': replay_response.body
-                        }
-                    })
-
-            except Exception as e:
-                logger.error(f"Error in replay comparison: {str(e)}")
-
-        return original_response
+        try:
+            # Prepare replay request
+            # Forward the raw header pairs and query string as received
+            # instead of building Headers/QueryParams dicts from them
+            replay_request = ReplayRequest(
+                method=method,
+                url=scope['path'],
+                headers=[
+                    (name.decode('latin-1'), value.decode('latin-1'))
+                    for name, value in scope['headers']
+                ],
+                query_params=scope['query_string'].decode('latin-1')
+            )
+
+            if method in ['POST', 'PUT', 'PATCH']:
+                # Sent as received; the forwarded headers already carry its
+                # Content-Type, so there is no need to parse and re-serialize
+                replay_request.body = bytes(request_body)
+
+            # Replay request
+            replayer = await self._get_replayer()
+            replay_response = await replayer.replay_request(replay_request)
+
+            # Compare raw bytes; bodies are only decoded to record a difference
+            if (
+                response_status != replay_response.status_code or
+                response_body != replay_response.raw_body
+            ):
+                original_body = response_body.decode('utf-8', 'replace')
+                self.differences.append({
+                    'timestamp': time.time(),
+                    'path': scope['path'],
+                    'method': method,
+                    'original': {
+                        'status_code': response_status,
+                        'body': original_body
+                    },
+                    'replay': {
+                        'status_code': replay_response.status_code,
+                        'body': replay_response.body
+                    }
+                })
+
+        except Exception as e:
+            logger.error(f"Error in replay comparison: {str(e)}")
 
     def get_differences(
         self,
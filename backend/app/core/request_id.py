@@ -1,46 +1,69 @@
 from typing import Optional
-import uuid
-from contextvars import ContextVar
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from app.core.logging import logger
+import re
+import secrets
+from app.core.logging import logger, request_id_ctx
 
-request_id_ctx_var: ContextVar[str] = ContextVar("request_id", default="")
+# The same variable the log formatter reads, so log records carry the id
+request_id_ctx_var = request_id_ctx
+
+# Canonical dashed UUIDs and the 32-hex-digit form generated below
+_UUID_RE = re.compile(
+    r'\A(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'
+    r'|[0-9a-fA-F]{32})\Z'
+)
+
+class RequestIDMiddleware:
+    """Pure ASGI middleware assigning each request an id and echoing it back"""
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
     def __init__(
         self,
         app,
         header_name: str = "X-Request-ID",
         validate_uuid: bool = True
     ):
-        super().__init__(app)
+        self.app = app
         self.header_name = header_name
+        self._raw_header_name = header_name.lower().encode('latin-1')
         self.validate_uuid = validate_uuid
 
-    async def dispatch(self, request: Request, call_next):
-        request_id = self._get_or_generate_request_id(request)
-        request_id_ctx_var.set(request_id)
-        request.state.request_id = request_id
-        
-        response = await call_next(request)
-        response.headers[self.header_name] = request_id
-        
-        return response
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        request_id = self._get_or_generate_request_id(scope)
+        token = request_id_ctx_var.set(request_id)
+        # Where request.state reads from
+        scope.setdefault('state', {})['request_id'] = request_id
+        header = (self._raw_header_name, request_id.encode('latin-1'))
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                headers = [
+                    h for h in message.get('headers', ())
+                    if h[0] != header[0]
+                ]
+                headers.append(header)
+                message['headers'] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_ctx_var.reset(token)
 
-    def _get_or_generate_request_id(self, request: Request) -> str:
-        request_id = request.headers.get(self.header_name)
+    def _get_or_generate_request_id(self, scope) -> str:
+        request_id = None
+        for name, value in scope['headers']:
+            if name == self._raw_header_name:
+                request_id = value.decode('latin-1')
+                break
         
         if not request_id:
-            return str(uuid.uuid4())
+            return secrets.token_hex(16)
             
-        if self.validate_uuid:
-            try:
-                uuid.UUID(request_id)
-                return request_id
-            except ValueError:
-                logger.warning(f"Invalid request ID format: {request_id}")
-                return str(uuid.uuid4())
+        if self.validate_uuid and _UUID_RE.match(request_id) is None:
+            logger.warning(f"Invalid request ID format: {request_id}")
+            return secrets.token_hex(16)
                 
         return request_id
 
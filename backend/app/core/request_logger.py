@@ -1,8 +1,7 @@
 from typing import Dict, Any, Optional
+import logging
 from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
 import time
-from datetime import datetime
 from app.core.logging import logger
 from app.core.context import RequestContext
 
@@ -12,25 +11,48 @@ class RequestLogger:
         request: Request,
         response: Optional[Response] = None,
         error: Optional[Exception] = None,
-        duration: Optional[float] = None
+        duration: Optional[float] = None,
+        status_code: Optional[int] = None,
+        response_size: Optional[int] = None
     ) -> None:
+        """Log a finished request
+
+        Pure ASGI callers have no Response object and pass status_code and
+        response_size directly instead.
+        """
+        if response is not None:
+            status_code = response.status_code
+            response_size = len(response.body) if hasattr(response, 'body') else None
+
+        # Log at appropriate level based on status code or error
+        if error or (status_code is not None and status_code >= 500):
+            level, message = logging.ERROR, "Request failed"
+        elif status_code is not None and status_code >= 400:
+            level, message = logging.WARNING, "Request failed"
+        else:
+            level, message = logging.INFO, "Request completed"
+        # Nothing below is needed when the record would be dropped anyway
+        if not logger.isEnabledFor(level):
+            return
+
         context = RequestContext.get_current()
-        
+        scope = request.scope
+        client = scope.get('client')
         log_data = {
             'request_id': context.request_id,
-            'method': request.method,
-            'path': str(request.url.path),
-            'query_params': dict(request.query_params),
-            'client_ip': request.client.host,
+            'method': scope['method'],
+            'path': scope['path'],
+            # Raw query string; decoding it into params is left to readers
+            'query_string': scope['query_string'].decode('latin-1'),
+            'client_ip': client[0] if client else None,
             'user_agent': request.headers.get('user-agent'),
-            'timestamp': datetime.utcnow().isoformat(),
             'duration_ms': round(duration * 1000) if duration else None
         }
 
-        if response:
+        if status_code is not None:
             log_data.update({
-                'status_code': response.status_code,
-                'response_size': len(response.body) if hasattr(response, 'body') else None
+                'status_code': status_code,
+                'response_size': response_size
             })
 
         if error:
@@ -42,36 +64,50 @@ class RequestLogger:
         if context.user_id:
             log_data['user_id'] = context.user_id
 
-        # Add custom tags
-        log_data.update(context.get_all_tags())
+        # Add custom tags; read in place, log_data is already a fresh dict
+        log_data.update(context.tags)
 
-        # Log at appropriate level based on status code or error
-        if error or (response and response.status_code >= 500):
-            logger.error("Request failed", extra=log_data)
-        elif response and response.status_code >= 400:
-            logger.warning("Request failed", extra=log_data)
-        else:
-            logger.info("Request completed", extra=log_data)
+        logger.log(level, message, extra=log_data)
+
+class RequestLoggingMiddleware:
+    """Pure ASGI middleware logging every HTTP request on completion"""
+
+    def __init__(self, app):
+        self.app = app
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next) -> Response:
-        start_time = time.time()
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        start_ns = time.monotonic_ns()
         error = None
-        response = None
+        status_code = None
+        response_size = None
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_size
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                for name, value in message.get('headers', ()):
+                    if name == b'content-length':
+                        if value.isdigit():
+                            response_size = int(value)
+                        break
+            await send(message)
 
         try:
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, send_wrapper)
             
         except Exception as e:
             error = e
             raise
             
         finally:
-            duration = time.time() - start_time
+            duration = (time.monotonic_ns() - start_ns) * 1e-9
             RequestLogger.log_request(
-                request,
-                response=response,
+                Request(scope),
                 error=error,
-                duration=duration
+                duration=duration,
+                status_code=status_code,
+                response_size=response_size
             ) 
\ No newline at end of file
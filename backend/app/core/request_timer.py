@@ -1,67 +1,87 @@
 from typing import Dict, Any, Optional
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
 import time
 from datetime import datetime
 from app.core.logging import logger
 from app.core.metrics import MetricsCollector
 
 class RequestTimer:
+    """Monotonic request timer; splits are kept as integer nanoseconds"""
+
     def __init__(self):
-        self.start_time = time.time()
-        self.splits: Dict[str, float] = {}
+        self.start_ns = time.monotonic_ns()
+        self.splits: Dict[str, int] = {}
 
     def split(self, name: str) -> None:
-        self.splits[name] = time.time() - self.start_time
+        self.splits[name] = time.monotonic_ns() - self.start_ns
 
     def get_timings(self) -> Dict[str, float]:
+        """Splits and total in seconds"""
+        total = (time.monotonic_ns() - self.start_ns) * 1e-9
+        # Most requests record no splits
+        if not self.splits:
+            return {'total': total}
         timings = {
-            name: duration
+            name: duration * 1e-9
             for name, duration in self.splits.items()
         }
-        timings['total'] = time.time() - self.start_time
+        timings['total'] = total
         return timings
 
-class RequestTimingMiddleware(BaseHTTPMiddleware):
+class RequestTimingMiddleware:
+    """Pure ASGI middleware timing requests; the timer is on request.state"""
+
     def __init__(
         self,
         app,
         metrics_collector: MetricsCollector,
         slow_request_threshold: float = 1.0
     ):
-        super().__init__(app)
+        self.app = app
         self.metrics_collector = metrics_collector
         self.slow_request_threshold = slow_request_threshold
 
-    async def dispatch(self, request: Request, call_next) -> Response:
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
         timer = RequestTimer()
-        request.state.timer = timer
+        # Where request.state reads from
+        state = scope.setdefault('state', {})
+        state['timer'] = timer
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
 
         try:
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, send_wrapper)
             
         finally:
             timings = timer.get_timings()
             total_time = timings['total']
+            method = scope['method']
+            path = scope['path']
 
             # Record metrics
             self.metrics_collector.timing(
                 'request.duration',
                 total_time,
                 tags={
-                    'method': request.method,
-                    'path': request.url.path,
-                    'status_code': getattr(response, 'status_code', 500)
+                    'method': method,
+                    'path': path,
+                    'status_code': status_code
                 }
             )
 
             # Log slow requests
             if total_time > self.slow_request_threshold:
                 logger.warning(
-                    f"Slow request detected: {request.method} {request.url.path}",
+                    f"Slow request detected: {method} {path}",
                     extra={
-                        'request_id': getattr(request.state, 'request_id', None),
+                        'request_id': state.get('request_id'),
                         'duration': total_time,
                         'timings': timings
                     }
@@ -66,6 +66,8 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             '/openapi.json'
         }
         self.security = HTTPBearer()
+        self._allowed_hosts = frozenset(self.config.allowed_hosts)
+        self._allow_any_host = "*" in self._allowed_hosts
 
     async def dispatch(self, request: Request, call_next) -> Response:
         try:
@@ -87,11 +89,11 @@ class SecurityMiddleware(BaseHTTPMiddleware):
 
     def _validate_host(self, request: Request) -> bool:
         """Validate request host"""
-        if "*" in self.config.allowed_hosts:
+        if self._allow_any_host:
             return True
 
-        host = request.headers.get("host", "").split(":")[0]
-        return host in self.config.allowed_hosts
+        host = request.headers.get("host", "").partition(":")[0]
+        return host in self._allowed_hosts
 
     def _add_security_headers(self, response: Response) -> Response:
         """Add security headers to response"""
@@ -0,0 +1,16 @@
+import time
+
+# (whole second, formatted prefix), swapped as one tuple so concurrent
+# formatters never see a mismatched pair
+_ts_cache = (-1, '')
+
+def format_timestamp(created: float) -> str:
+    """Format a record's creation time as ISO-8601 UTC, reusing the
+    formatted date/time while the whole second is unchanged"""
+    global _ts_cache
+    second = int(created)
+    cached_second, prefix = _ts_cache
+    if second != cached_second:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        _ts_cache = (second, prefix)
+    return f"{prefix}.{int((created - second) * 1e6):06d}Z"
@@ -0,0 +1,43 @@
+from starlette.requests import Request
+from app.core.mocking import MockDefinition, MockResponse, MockServer
+
+def make_request(method, path):
+    return Request({
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": b"",
+        "headers": []
+    })
+
+def test_body_matched_mock():
+    mock_server = MockServer()
+    mock_server.add_mock(
+        MockDefinition(
+            method="POST",
+            path="/api/users",
+            match_body=True,
+            expected_body={"name": "Test User"},
+            response=MockResponse(status_code=201)
+        )
+    )
+    assert mock_server.needs_body("POST")
+
+    # Matching body returns the mock
+    mock = mock_server.get_mock(
+        make_request("POST", "/api/users"),
+        {"name": "Test User"}
+    )
+    assert mock is not None
+    assert mock.call_count == 1
+
+    # Any other body falls through to the application
+    assert mock_server.get_mock(
+        make_request("POST", "/api/users"),
+        {"name": "Other User"}
+    ) is None
+    assert mock_server.get_mock(make_request("POST", "/api/users"), None) is None
+    assert mock.call_count == 1
+
+if __name__ == "__main__":
+    test_body_matched_mock()